@@ -0,0 +1,216 @@
+"""Time every stage of report generation on synthetic data and compare the results with a stored baseline.
+
+Run from the repository root, with the same PYTHONPATH as main.py:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --output new.json --baseline results.json --threshold 0.15
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import pandas as pd
+from benchmarks.synthetic_data import scenario_csv, scenario_data_config
+from config.config_handling import read_config
+from data_processing.dataProcessing import load_projected_data, apply_filters, group_data, calculate_totals
+from data_processing.rendered_pivot import pivot_columns, render_pivot
+from output_generation.excel.excelGeneration import save_excel
+from output_generation.pdf.pdfGeneration import save_pdf
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIOS_FILE = os.path.join(os.path.dirname(__file__), "scenarios.json")
+DEFAULT_CONFIG_FILE = 'config/config.json'
+STAGES = ["load", "filter", "group", "totals", "table", "pdf", "excel"]
+DEFAULT_THRESHOLD = 0.10
+# Stages faster than this are reported but never flagged, since their timings are mostly noise.
+MIN_COMPARED_SECONDS = 0.1
+# Likewise for stages whose memory growth is within allocator noise.
+MIN_COMPARED_MB = 8
+RSS_SAMPLE_SECONDS = 0.005
+MB = 1024 * 1024
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far; ru_maxrss is in bytes on macOS and KiB elsewhere."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process right now, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except OSError:
+        return None
+
+
+class RssGrowth:
+    """Measure how far a stage raises the RSS above what it was when the stage started.
+
+    Current RSS is sampled from a background thread while the stage runs. Without /proc, this falls back to
+    how much the stage raised the process-wide peak, which reads 0 for a stage staying below an earlier peak.
+    """
+
+    def __enter__(self):
+        self.start = self.peak = current_rss_mb()
+        self.done, self.thread = threading.Event(), None
+        if self.start is None:
+            self.start = peak_rss_mb()
+        else:
+            self.thread = threading.Thread(target=self.sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.done.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __exit__(self, *exc_info):
+        if self.thread is None:
+            self.peak = peak_rss_mb()
+        else:
+            self.done.set()
+            self.thread.join()
+            self.peak = max(self.peak, current_rss_mb())
+        self.mb = self.peak - self.start
+        return False
+
+
+def run_in_fresh_process(func, *args):
+    """Run a function in its own worker process, so its memory use is not inherited from earlier work."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(func, *args).result()
+
+
+def run_scenario(scenario: Dict, csv_path: str, styles: Dict) -> Dict:
+    """Run one scenario stage by stage, recording the time and the peak RSS growth of each stage."""
+    data_config = scenario_data_config(scenario, csv_path)
+    group_cols, agg_col, subtotal_cols = data_config["group_cols"], data_config["agg_col"], data_config["subtotal_col"]
+    dynamic_columns = pivot_columns(group_cols, agg_col)
+    stages = {}
+
+    def timed(stage, func, *args):
+        with RssGrowth() as rss:
+            start = time.perf_counter()
+            result = func(*args)
+            seconds = time.perf_counter() - start
+        stages[stage] = {"seconds": seconds, "rss_growth_mb": rss.mb}
+        return result
+
+    df = timed("load", load_projected_data, data_config["csv_file_path"], data_config["filters"], group_cols,
+               data_config["agg_func"], agg_col, subtotal_cols)
+    filtered = timed("filter", apply_filters, df, data_config["filters"])
+    grouped = timed("group", group_data, filtered, group_cols, data_config["agg_func"], agg_col)
+    final_data = timed("totals", calculate_totals, grouped, subtotal_cols, agg_col)
+    pivot = timed("table", render_pivot, final_data, dynamic_columns)
+    with tempfile.TemporaryDirectory() as output_dir:
+        timed("pdf", save_pdf, pivot, os.path.join(output_dir, "report.pdf"), styles)
+        timed("excel", save_excel, pivot, os.path.join(output_dir, "report.xlsx"), styles)
+    return {"pivot_rows": len(final_data), "stages": stages}
+
+
+def best_of(runs: List[Dict]) -> Dict:
+    """Keep the fastest time and the lowest RSS growth of each stage over repeated runs."""
+    return {"pivot_rows": runs[0]["pivot_rows"],
+            "stages": {stage: {metric: min(run["stages"][stage][metric] for run in runs)
+                               for metric in ("seconds", "rss_growth_mb")}
+                       for stage in STAGES}}
+
+
+def run_benchmarks(scenarios: List[Dict], styles: Dict, data_dir: str, repeat: int = 1) -> Dict:
+    results = {}
+    for scenario in scenarios:
+        csv_path = run_in_fresh_process(scenario_csv, scenario, data_dir)
+        runs = [run_in_fresh_process(run_scenario, scenario, csv_path, styles) for _ in range(repeat)]
+        results[scenario["name"]] = dict(best_of(runs), params={k: v for k, v in scenario.items() if k != "name"})
+        log_scenario(scenario["name"], results[scenario["name"]])
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__,
+                        "machine": platform.machine(), "cpus": os.cpu_count()},
+        "scenarios": results,
+    }
+
+
+def log_scenario(name: str, result: Dict) -> None:
+    logger.info(f"{name} ({result['pivot_rows']} pivot rows)")
+    for stage in STAGES:
+        logger.info(f"  {stage:<8} {result['stages'][stage]['seconds']:>8.3f}s "
+                    f"  peak RSS +{result['stages'][stage]['rss_growth_mb']:.1f} MB")
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Return a description of every stage that got slower or used more memory than the baseline allows."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if base.get("params") != result.get("params"):
+            logger.warning(f"Scenario {name} changed since the baseline; skipping it.")
+            continue
+        for stage in STAGES:
+            now, then = result["stages"][stage], base["stages"].get(stage)
+            if then is None:
+                continue
+            if now["seconds"] >= MIN_COMPARED_SECONDS and now["seconds"] > then["seconds"] * (1 + threshold):
+                regressions.append(f"{name}/{stage}: {then['seconds']:.3f}s -> {now['seconds']:.3f}s "
+                                   f"(+{now['seconds'] / then['seconds'] - 1:.0%})")
+            # Baselines written before the RSS growth metric only hold the process-wide peak, which differs.
+            growth, base_growth = now["rss_growth_mb"], then.get("rss_growth_mb")
+            if base_growth is not None and growth >= MIN_COMPARED_MB and growth > base_growth * (1 + threshold):
+                regressions.append(f"{name}/{stage}: RSS growth {base_growth:.1f} MB -> {growth:.1f} MB")
+    return regressions
+
+
+def main(args: argparse.Namespace) -> None:
+    scenarios = read_config(args.scenarios)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario["name"] in args.only]
+    styles = read_config(args.config_file)["styles"]
+
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+        results = run_benchmarks(scenarios, styles, args.data_dir, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            results = run_benchmarks(scenarios, styles, data_dir, args.repeat)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        logger.info(f"Results written to {args.output}.")
+
+    if args.baseline:
+        regressions = compare_results(results, read_config(args.baseline), args.threshold)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            raise SystemExit(1)
+        logger.info(f"No regression beyond {args.threshold:.0%} of {args.baseline}.")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(module)s:%(message)s')
+    parser = argparse.ArgumentParser(description="Benchmark report generation on synthetic data.")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS_FILE, help="JSON list of benchmark scenarios")
+    parser.add_argument('--only', nargs='+', help="Names of the scenarios to run")
+    parser.add_argument('--config-file', default=DEFAULT_CONFIG_FILE, help="Config file providing the styles")
+    parser.add_argument('--data-dir', help="Directory keeping generated CSVs between runs")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per scenario; the best of them is kept")
+    parser.add_argument('--output', help="Path of the JSON results file")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown or memory growth over the baseline, as a fraction")
+    main(parser.parse_args())
@@ -0,0 +1,129 @@
+"""Time how long main.py takes to start for commands that should not pay for the whole pipeline.
+
+Every command runs in a fresh interpreter and the best of --repeat runs is kept; one more run under
+`python -X importtime` records which heavy libraries the command imported. Commands listed in LIGHT_COMMANDS
+fail the benchmark if they import any of them. Run from the repository root, with the same PYTHONPATH as main.py:
+
+    python -m benchmarks.startup_time --output startup.json
+    python -m benchmarks.startup_time --baseline startup.json --threshold 0.2
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from benchmarks.synthetic_data import generate_report_csv, scenario_data_config
+from config.config_handling import read_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_FILE = 'config/config.json'
+COMMANDS = {
+    "import": ["-c", "import main"],
+    "help": ["main.py", "--help"],
+    "check_config": ["main.py", "--config-file", "{config}", "--check-config"],
+    "csv_report": ["main.py", "--config-file", "{config}", "--no-cache", "--formats", "csv"],
+}
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "reportlab", "openpyxl", "polars", "duckdb"]
+LIGHT_COMMANDS = {"import", "help", "check_config"}
+SCENARIO = {"rows": 2_000, "cardinalities": [10, 5], "subtotal_levels": 1}
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+# Differences below this are interpreter noise rather than regressions.
+MIN_COMPARED_SECONDS = 0.05
+
+
+def command_line(command: str, config_file: str, *options: str) -> List[str]:
+    return [sys.executable, *options, *(arg.format(config=config_file) for arg in COMMANDS[command])]
+
+
+def time_command(args: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def imported_heavy_modules(args: List[str]) -> List[str]:
+    """Return the heavy top-level packages a command imports, from its `-X importtime` report."""
+    report = subprocess.run(args, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True).stderr
+    imported = {line.rsplit("|", 1)[-1].strip() for line in report.splitlines() if line.startswith("import time:")}
+    return [module for module in HEAVY_MODULES if module in imported]
+
+
+def write_report_config(data_dir: str, styles: Dict) -> str:
+    csv_path = os.path.join(data_dir, "startup.csv")
+    generate_report_csv(csv_path, SCENARIO["rows"], SCENARIO["cardinalities"])
+    config_file = os.path.join(data_dir, "startup.json")
+    with open(config_file, "w") as file:
+        json.dump({"data": scenario_data_config(SCENARIO, csv_path), "styles": styles}, file)
+    return config_file
+
+
+def run_startup_benchmarks(styles: Dict, repeat: int = DEFAULT_REPEAT) -> Dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        config_file = write_report_config(data_dir, styles)
+        for command in COMMANDS:
+            results[command] = {
+                "seconds": time_command(command_line(command, config_file), repeat),
+                "heavy_modules": imported_heavy_modules(command_line(command, config_file, "-X", "importtime")),
+            }
+            logger.info(f"  {command:<13} {results[command]['seconds']:>7.3f}s  "
+                        f"imports: {', '.join(results[command]['heavy_modules']) or '-'}")
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "commands": results,
+    }
+
+
+def startup_problems(current: Dict, baseline: Dict = None, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Return every light command that imports a heavy library, and every command slower than the baseline."""
+    problems = [f"{command} imports {', '.join(result['heavy_modules'])}"
+                for command, result in current["commands"].items()
+                if command in LIGHT_COMMANDS and result["heavy_modules"]]
+    for command, result in current["commands"].items():
+        then = (baseline or {}).get("commands", {}).get(command)
+        if then is None:
+            continue
+        now = result["seconds"]
+        if now - then["seconds"] >= MIN_COMPARED_SECONDS and now > then["seconds"] * (1 + threshold):
+            problems.append(f"{command}: {then['seconds']:.3f}s -> {now:.3f}s (+{now / then['seconds'] - 1:.0%})")
+    return problems
+
+
+def main(args: argparse.Namespace) -> None:
+    results = run_startup_benchmarks(read_config(args.config_file)["styles"], args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        logger.info(f"Results written to {args.output}.")
+
+    problems = startup_problems(results, read_config(args.baseline) if args.baseline else None, args.threshold)
+    for problem in problems:
+        logger.error(f"Regression: {problem}")
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(module)s:%(message)s')
+    parser = argparse.ArgumentParser(description="Benchmark the start-up time of the command-line entry point.")
+    parser.add_argument('--config-file', default=DEFAULT_CONFIG_FILE, help="Config file providing the styles")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Runs per command; the best is kept")
+    parser.add_argument('--output', help="Path of the JSON results file")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown over the baseline, as a fraction")
+    main(parser.parse_args())
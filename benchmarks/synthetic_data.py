@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pandas as pd
+
+AGG_COL = "duration"
+FILTER_COL = "result"
+
+
+def level_columns(num_levels):
+    return [f"level_{i}" for i in range(1, num_levels + 1)]
+
+
+def generate_report_csv(file_path, rows, cardinalities, extra_columns=0, label_width=8, failed_ratio=0.7, seed=0):
+    """Write a synthetic failure export with one group column per entry of `cardinalities`.
+
+    Level i takes `cardinalities[i]` distinct labels padded to `label_width` characters, `result` is "failed" for
+    about `failed_ratio` of the rows, `duration` holds the values to aggregate and `extra_columns` filler text
+    columns widen the file without being used by the pivot.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column, cardinality in zip(level_columns(len(cardinalities)), cardinalities):
+        prefix = f"{column[-1]}_"
+        codes = rng.integers(0, cardinality, rows).astype(str)
+        data[column] = np.char.add(prefix, np.char.zfill(codes, max(label_width - len(prefix), 1)))
+    data[FILTER_COL] = rng.choice(["failed", "passed"], rows, p=[failed_ratio, 1 - failed_ratio])
+    data[AGG_COL] = rng.random(rows).round(3)
+    for i in range(1, extra_columns + 1):
+        data[f"extra_{i}"] = np.char.add("note-", rng.integers(0, 1_000_000, rows).astype(str))
+    pd.DataFrame(data).to_csv(file_path, index=False)
+
+
+def scenario_csv(scenario, data_dir):
+    """Return the CSV of a scenario, generating it once per distinct set of data parameters."""
+    params = [scenario["rows"], *scenario["cardinalities"], scenario.get("extra_columns", 0),
+              scenario.get("label_width", 8), scenario.get("seed", 0)]
+    file_path = os.path.join(data_dir, "synthetic_" + "_".join(str(p) for p in params) + ".csv")
+    if not os.path.exists(file_path):
+        generate_report_csv(file_path, scenario["rows"], scenario["cardinalities"],
+                            extra_columns=scenario.get("extra_columns", 0),
+                            label_width=scenario.get("label_width", 8), seed=scenario.get("seed", 0))
+    return file_path
+
+
+def scenario_data_config(scenario, csv_path):
+    """Build the `data` config of a scenario: sum of durations of failed rows over every level."""
+    group_cols = level_columns(len(scenario["cardinalities"]))
+    return {
+        "csv_file_path": csv_path,
+        "filters": {FILTER_COL: "failed"},
+        "group_cols": group_cols,
+        "agg_func": "sum",
+        "agg_col": AGG_COL,
+        "subtotal_col": group_cols[:scenario.get("subtotal_levels", 1)],
+    }
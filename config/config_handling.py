@@ -1,5 +1,6 @@
 import json
-from typing import Dict
+import os
+from typing import Dict, List
 
 
 def read_config(config_file: str) -> Dict:
@@ -16,3 +17,18 @@ def get_interactive_config() -> Dict:
         'agg_col': input("Enter the aggregation column name: "),
         'subtotal_col': input("Enter the subtotal columns (comma-separated): ").split(',')
     }
+
+
+def read_batch_config(batch_file: str) -> List[Dict]:
+    """Read a list of report specs, each either a config file path or an inline config with an optional name."""
+    specs = []
+    for index, entry in enumerate(read_config(batch_file), 1):
+        if isinstance(entry, str):
+            spec = dict(read_config(entry), name=os.path.splitext(os.path.basename(entry))[0])
+        else:
+            spec = dict(entry)
+        spec.setdefault('name', f"report_{index}")
+        if any(other['name'] == spec['name'] for other in specs):
+            spec['name'] = f"{spec['name']}_{index}"
+        specs.append(spec)
+    return specs
@@ -0,0 +1,114 @@
+"""Aggregation backends that build the pivot through a common set of steps.
+
+The pandas path in `data_processing_controller` is the default. `pandas_backend` is the reference
+implementation of the backend steps, and every other backend is a module exposing the same steps, chained by
+`build_backend_final_data`:
+
+    AGGREGATIONS                               aggregation functions the backend supports, besides count
+    TYPE_INFERENCE_ERRORS                      errors raised when a CSV value does not fit its sampled type
+    session(options)                           context manager yielding what the steps below run on
+    load(session, file_path, file_format, columns, infer_all_rows)
+    filter_rows(data, predicates)              predicates as compiled by `filter_engine.compile_filters`
+    group(data, group_cols, agg_func, agg_col) drops rows with a missing group key, like pandas groupby
+    sort(data, columns)
+    collect(session, data)                     materializes the grouped rows
+    rollup(session, grouped, subtotal_cols, agg_col)
+                                               {level: sums of agg_col over subtotal_cols[:level]}
+    to_pandas(data)
+
+The subtotal and grand total rows are then interleaved by `calculate_totals`, so every backend produces the
+same `final_data` as the pandas path. Regex filters are the exception: each engine runs them with its own
+regex syntax, and patterns using Python-only features such as lookarounds are rejected outside pandas.
+"""
+import importlib
+from typing import Dict, Optional
+import pandas as pd
+from dataProcessing import calculate_totals, required_columns, validate_columns
+from filter_engine import compile_filters
+from input_formats import detect_format, read_header
+from utils.profiling import span
+
+PANDAS_BACKEND = "pandas"
+BACKEND_MODULES = {PANDAS_BACKEND: "pandas_backend", "polars": "polars_backend", "duckdb": "duckdb_backend"}
+
+
+def selected_backend(data_config: Dict) -> str:
+    backend = data_config.get("backend", PANDAS_BACKEND)
+    if backend not in BACKEND_MODULES:
+        raise ValueError(f"Unknown aggregation backend '{backend}'; expected one of "
+                         f"{list(BACKEND_MODULES)}.")
+    return backend
+
+
+def use_external_backend(data_config: Dict) -> bool:
+    return selected_backend(data_config) != PANDAS_BACKEND
+
+
+def get_backend(name: str):
+    """Import a backend module, which pulls in its optional dependency only when it is used."""
+    try:
+        return importlib.import_module(BACKEND_MODULES[name])
+    except ImportError as e:
+        raise ImportError(f"The {name} aggregation backend requires the '{name}' package: {e}")
+
+
+def build_backend_final_data(csv_path: str, data_config: Dict):
+    """Build `final_data` with the configured backend, or return None when no rows match."""
+    backend = get_backend(selected_backend(data_config))
+    options = data_config.get("backend_options", {})
+    filters, group_cols = data_config["filters"], data_config["group_cols"]
+    agg_func, agg_col, subtotal_cols = data_config["agg_func"], data_config["agg_col"], data_config["subtotal_col"]
+
+    if agg_func != "count" and agg_func not in backend.AGGREGATIONS:
+        raise ValueError(f"Aggregation '{agg_func}' is not supported by the {selected_backend(data_config)} backend.")
+    file_format = detect_format(csv_path, data_config.get("input_format"))
+    header = read_header(csv_path, file_format)
+    validate_columns(header, filters, group_cols)
+    if agg_func != "count" and agg_col not in header:
+        raise ValueError(f"Aggregation column '{agg_col}' not found in data.")
+
+    columns = required_columns(filters, group_cols, agg_func, agg_col, subtotal_cols)
+    predicates = compile_filters(filters)
+
+    def group_rows(session, infer_all_rows):
+        data = backend.filter_rows(backend.load(session, csv_path, file_format, columns, infer_all_rows), predicates)
+        return backend.collect(session, backend.sort(backend.group(data, group_cols, agg_func, agg_col), group_cols))
+
+    with backend.session(options) as session:
+        with span("backend_query") as query_span:
+            try:
+                grouped = group_rows(session, infer_all_rows=False)
+            except backend.TYPE_INFERENCE_ERRORS:
+                grouped = group_rows(session, infer_all_rows=True)
+            grouped_data = backend.to_pandas(grouped)
+            query_span.rows_out = len(grouped_data)
+        if grouped_data.empty:
+            return None
+
+        rollup = None
+        # Limited rows are rolled up from the frame `limit_groups` returns instead.
+        if subtotal_cols and data_config.get("top_n") is None:
+            with span("backend_rollup"):
+                rollup = {level: backend.to_pandas(subtotals)
+                          for level, subtotals in backend.rollup(session, grouped, subtotal_cols, agg_col).items()}
+    return calculate_totals(grouped_data, subtotal_cols, agg_col, rollup, data_config.get("top_n"))
+
+
+def compare_backends(csv_path: str, data_config: Dict, reference) -> Dict[str, Optional[str]]:
+    """Build `final_data` with every backend and describe how each differs from the default path's `reference`.
+
+    Maps each backend to None when it matches, or to the difference (or error) otherwise. Column dtypes are
+    not compared, since each engine widens integer aggregates differently.
+    """
+    results = {}
+    for name in BACKEND_MODULES:
+        try:
+            final_data = build_backend_final_data(csv_path, dict(data_config, backend=name))
+            if reference is None or final_data is None:
+                results[name] = None if reference is final_data else "only one side found data"
+            else:
+                pd.testing.assert_frame_equal(final_data, reference, check_dtype=False)
+                results[name] = None
+        except (AssertionError, ImportError, ValueError) as e:
+            results[name] = str(e)
+    return results
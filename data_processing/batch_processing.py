@@ -0,0 +1,184 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+from data_validation import validate_csv_path
+from file_formats import format_from_path
+from dataProcessing import downcast_integers, load_data, plan_columns, preprocess_data, calculate_totals
+from data_processing_controller import build_final_data, use_incremental, use_streaming, write_output_files
+from result_cache import cached_result, is_cached
+from aggregation_backends import use_external_backend
+from output_generation.outputFormats import selected_formats
+from rendered_pivot import pivot_columns, render_pivot
+from utils.profiling import span
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Frames shared by every report of a batch, keyed by CSV path and input format. Workers inherit them from the
+# parent process.
+_datasets: Dict = {}
+
+
+def _init_worker(datasets: Dict) -> None:
+    _datasets.update(datasets)
+
+
+def plan_shared_columns(csv_path: str, data_configs: List[Dict]):
+    """Merge the column projections of every report over the same CSV so it only has to be parsed once."""
+    usecols, dtype = [], {}
+    for data_config in data_configs:
+        columns, types = plan_columns(csv_path, data_config["filters"], data_config["group_cols"],
+                                      data_config["agg_func"], data_config["agg_col"], data_config["subtotal_col"],
+                                      data_config.get("input_format"))
+        if columns is None:
+            return None, None
+        usecols.extend(col for col in columns if col not in usecols)
+        dtype.update(types)
+    return usecols, dtype
+
+
+def cache_config_for(spec: Dict, use_cache: bool) -> Dict:
+    return spec.get("cache", {}) if use_cache and not use_incremental(spec["data"]) else {"enabled": False}
+
+
+def dataset_key(csv_path: str, data_config: Dict):
+    """Key of the shared frame a report reads, or None when its input_format is invalid and it reads nothing."""
+    try:
+        return csv_path, format_from_path(csv_path, data_config.get("input_format"))
+    except ValueError:
+        return None
+
+
+def load_shared_datasets(specs: List[Dict], use_cache: bool = True) -> Dict:
+    """Parse each distinct CSV once with the union of the columns its uncached reports need.
+
+    Reports reading the same file as different input formats get a frame each.
+
+    Files large enough for streaming mode, or read incrementally or by another backend for one of their
+    reports, are left out; their reports read the file themselves. So are missing files and files that fail to
+    load, whose reports then fail on their own without stopping the rest of the batch.
+    """
+    by_path = {}
+    for spec in specs:
+        csv_path = spec["data"]["csv_file_path"]
+        if not os.path.isfile(csv_path):
+            logger.warning(f"CSV file not found: {csv_path}; skipping the reports that use it.")
+            continue
+        if not is_cached(csv_path, spec["data"], cache_config_for(spec, use_cache)):
+            key = dataset_key(csv_path, spec["data"])
+            if key is not None:
+                by_path.setdefault(key, []).append(spec["data"])
+
+    datasets = {}
+    for (csv_path, file_format), data_configs in by_path.items():
+        if any(use_external_backend(data_config) or use_incremental(data_config)
+               or use_streaming(csv_path, data_config) for data_config in data_configs):
+            continue
+        start = time.perf_counter()
+        try:
+            with span("load") as load_span:
+                usecols, dtype = plan_shared_columns(csv_path, data_configs)
+                df = downcast_integers(load_data(csv_path, usecols=usecols, dtype=dtype, file_format=file_format),
+                                       [data_config["agg_col"] for data_config in data_configs])
+                load_span.rows_out = len(df)
+        except (KeyError, ValueError, OSError) as e:
+            logger.warning(f"Could not preload {csv_path} ({e}); its reports will read it themselves.")
+            continue
+        datasets[csv_path, file_format] = df
+        logger.info(f"Loaded {csv_path} as {file_format} ({len(df)} rows) in {time.perf_counter() - start:.2f}s.")
+    return datasets
+
+
+def build_report_data(csv_path: str, data_config: Dict):
+    """Build the pivot of one report from the shared frame of its CSV, or from the file when none was loaded."""
+    df = _datasets.get(dataset_key(csv_path, data_config))
+    if df is None or use_external_backend(data_config):
+        return build_final_data(csv_path, data_config)
+    if df.empty:
+        return None
+    processed_data = preprocess_data(df, agg_col=data_config["agg_col"],
+                                     **{k: data_config[k] for k in ["filters", "group_cols", "agg_func"]})
+    return calculate_totals(processed_data, data_config["subtotal_col"], data_config["agg_col"],
+                            top_n=data_config.get("top_n"))
+
+
+def run_report(spec: Dict, use_cache: bool = True, formats: Optional[List[str]] = None,
+               keep_pivot: bool = False) -> Dict:
+    """Build and render one report of a batch, returning its timings.
+
+    With `keep_pivot`, a report with an Excel output does not write it; its rendered pivot is returned under
+    "pivot_table" instead, for the caller to add to a shared workbook.
+    """
+    data_config = spec["data"]
+    csv_path = data_config["csv_file_path"]
+    timing = {"name": spec["name"], "rows": 0, "pivot": 0.0, "render": 0.0, "status": "ok"}
+    start = time.perf_counter()
+    try:
+        formats = selected_formats(spec, formats)
+        validate_csv_path(csv_path)
+        final_data = cached_result(csv_path, data_config, cache_config_for(spec, use_cache),
+                                   lambda: build_report_data(csv_path, data_config))
+        if final_data is None:
+            timing["status"] = "no data"
+            return timing
+
+        timing["rows"], timing["pivot"] = len(final_data), time.perf_counter() - start
+
+        render_start = time.perf_counter()
+        pivot = render_pivot(final_data, pivot_columns(data_config["group_cols"], data_config["agg_col"]))
+        if keep_pivot and "excel" in formats:
+            timing["pivot_table"] = pivot
+            formats = [file_type for file_type in formats if file_type != "excel"]
+        if formats:
+            write_output_files(pivot, csv_path, spec["styles"], report_name=spec["name"], formats=formats)
+        timing["render"] = time.perf_counter() - render_start
+    except (KeyError, ValueError, OSError) as e:
+        logger.error(f"Error processing report {spec['name']}: {str(e)}")
+        timing["status"] = "failed"
+    return timing
+
+
+def log_timing_summary(timings: List[Dict]) -> None:
+    logger.info(f"{'Report':<30} {'Rows':>10} {'Pivot (s)':>10} {'Render (s)':>11} {'Total (s)':>10}  Status")
+    for timing in timings:
+        logger.info(f"{timing['name']:<30} {timing['rows']:>10} {timing['pivot']:>10.2f} {timing['render']:>11.2f} "
+                    f"{timing['pivot'] + timing['render']:>10.2f}  {timing['status']}")
+
+
+def run_batch(specs: List[Dict], jobs: int = 1, use_cache: bool = True,
+              formats: Optional[List[str]] = None, workbook: Optional[str] = None) -> List[Dict]:
+    """Run many reports in one process, sharing each parsed CSV across the reports that use it.
+
+    With `workbook`, every report becomes a sheet of that one Excel file instead of an Excel file of its own.
+    """
+    datasets = load_shared_datasets(specs, use_cache)
+    keep_pivot = workbook is not None
+    if keep_pivot:
+        from output_generation.excel.excelGeneration import add_excel_sheet, open_excel_workbook, save_excel_workbook
+        excel_workbook = open_excel_workbook()
+
+    timings = []
+    with ExitStack() as stack:
+        if jobs <= 1:
+            _init_worker(datasets)
+            results = (run_report(spec, use_cache, formats, keep_pivot) for spec in specs)
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                                               initargs=(datasets,)))
+            results = executor.map(run_report, specs, [use_cache] * len(specs), [formats] * len(specs),
+                                   [keep_pivot] * len(specs))
+        # Results arrive in batch order, so each sheet is written as its report finishes and its pivot dropped.
+        for spec, timing in zip(specs, results):
+            pivot = timing.pop("pivot_table", None)
+            if pivot is not None:
+                add_excel_sheet(excel_workbook, spec["name"], pivot, spec["styles"])
+            timings.append(timing)
+
+    if keep_pivot:
+        start = time.perf_counter()
+        save_excel_workbook(excel_workbook, workbook)
+        logger.info(f"Saved the batch workbook {workbook} in {time.perf_counter() - start:.2f}s.")
+    log_timing_summary(timings)
+    return timings
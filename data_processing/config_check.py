@@ -0,0 +1,79 @@
+"""Check a report config against the header of its input file without importing pandas.
+
+This is the `--check-config` fast path: it reports every problem it finds instead of stopping at the first,
+and only touches pyarrow for columnar inputs.
+"""
+import csv
+import os
+from typing import Dict, List, Optional
+from file_formats import format_from_path
+from output_generation.outputFormats import selected_formats
+
+REQUIRED_DATA_KEYS = {"csv_file_path": str, "filters": dict, "group_cols": list, "agg_func": str, "agg_col": str,
+                      "subtotal_col": list}
+STYLED_FORMATS = {"pdf", "excel", "html"}
+REQUIRED_STYLE_KEYS = ["alignment", "colors"]
+
+
+def read_file_header(file_path: str, file_format: str) -> List[str]:
+    if file_format == "csv":
+        # utf-8-sig drops a byte order mark, as pandas does.
+        with open(file_path, newline="", encoding="utf-8-sig") as file:
+            return next(csv.reader(file), [])
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(file_path).names
+    import pyarrow as pa
+    return pa.ipc.open_file(pa.memory_map(file_path, "r")).schema.names
+
+
+def column_problems(data_config: Dict, header: List[str]) -> List[str]:
+    columns = set(header)
+    referenced = [("filter", col) for col in data_config["filters"]]
+    referenced += [("group", col) for col in data_config["group_cols"]]
+    referenced += [("subtotal", col) for col in data_config["subtotal_col"]]
+    if data_config["agg_func"] != "count":
+        referenced.append(("aggregation", data_config["agg_col"]))
+    problems = [f"{role.capitalize()} column '{col}' is not in {data_config['csv_file_path']}."
+                for role, col in referenced if col not in columns]
+    problems += [f"Subtotal column '{col}' is not one of the group columns."
+                 for col in data_config["subtotal_col"] if col not in data_config["group_cols"]]
+    if not data_config["group_cols"]:
+        problems.append("At least one group column is required.")
+    return problems
+
+
+def config_problems(config: Dict, formats: Optional[List[str]] = None) -> List[str]:
+    """Return a description of everything that would stop the report from being built."""
+    data_config = config.get("data")
+    if not isinstance(data_config, dict):
+        return ["The config has no 'data' section."]
+    data_problems = [f"data.{key} is missing." for key in REQUIRED_DATA_KEYS if key not in data_config]
+    data_problems += [f"data.{key} should be a {kind.__name__}." for key, kind in REQUIRED_DATA_KEYS.items()
+                      if key in data_config and not isinstance(data_config[key], kind)]
+    top_n = data_config.get("top_n")
+    if top_n is not None and (isinstance(top_n, bool) or not isinstance(top_n, int) or top_n < 1):
+        data_problems.append("data.top_n should be a positive integer.")
+    return data_problems + output_problems(config, formats) + ([] if data_problems else input_problems(data_config))
+
+
+def output_problems(config: Dict, formats: Optional[List[str]] = None) -> List[str]:
+    try:
+        output_formats = selected_formats(config, formats)
+    except ValueError as e:
+        return [str(e)]
+    styled = sorted(STYLED_FORMATS.intersection(output_formats))
+    styles = config.get("styles", {})
+    return [f"styles.{key} is required by the {', '.join(styled)} output." for key in REQUIRED_STYLE_KEYS
+            if styled and key not in styles]
+
+
+def input_problems(data_config: Dict) -> List[str]:
+    file_path = data_config["csv_file_path"]
+    if not os.path.isfile(file_path):
+        return [f"Input file not found: {file_path}"]
+    try:
+        header = read_file_header(file_path, format_from_path(file_path, data_config.get("input_format")))
+    except Exception as e:
+        return [f"Cannot read the header of {file_path}: {e}"]
+    return column_problems(data_config, header)
@@ -1,43 +1,111 @@
+import numpy as np
 import pandas as pd
+from input_formats import detect_format, read_header, read_input, read_sample
+from filter_engine import apply_compiled_filters, compile_filters
+from utils.profiling import span
 
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
-pd.set_option('display.width', None)
-pd.set_option('display.max_colwidth', None)
+DTYPE_SAMPLE_ROWS = 10_000
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+SUBTOTAL_LEVEL_COL = "Subtotal_Level"
+OTHER_LABEL = "Other"
 
 
-def load_data(file_path):
+def load_data(file_path, usecols=None, dtype=None, file_format=None):
+    file_format = detect_format(file_path, file_format)
     try:
-        return pd.read_csv(file_path)
+        return read_input(file_path, file_format, usecols=usecols, dtype=dtype)
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame()
 
 
-def apply_filters(df, filters):
-    for filter_col, filter_value in filters.items():
-        df = df[df[filter_col] == filter_value]
+def required_columns(filters, group_cols, agg_func, agg_col, subtotal_cols=()):
+    columns = [*filters, *group_cols, *subtotal_cols]
+    if agg_func != "count":
+        columns.append(agg_col)
+    return list(dict.fromkeys(columns))
+
+
+def plan_columns(file_path, filters, group_cols, agg_func, agg_col, subtotal_cols=(), file_format=None):
+    """Return the `usecols` projection and `dtype` mapping for the columns the pivot needs.
+
+    Columns missing from the header are left out so `preprocess_data` can report them. Text filter and
+    group columns with few distinct values in a sample of the file are loaded as `category`.
+    """
+    file_format = detect_format(file_path, file_format)
+    try:
+        header = read_header(file_path, file_format)
+        usecols = [col for col in required_columns(filters, group_cols, agg_func, agg_col, subtotal_cols)
+                   if col in header]
+        sample = read_sample(file_path, file_format, usecols, DTYPE_SAMPLE_ROWS)
+    except Exception:
+        return None, None
+
+    dtype = {}
+    for col in dict.fromkeys([*filters, *group_cols]):
+        if col not in sample.columns or sample.empty or pd.api.types.is_numeric_dtype(sample[col]):
+            continue
+        if sample[col].nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(sample):
+            dtype[col] = "category"
+    return usecols, dtype
+
+
+def downcast_integers(df, columns):
+    for col in columns:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def load_projected_data(file_path, filters, group_cols, agg_func, agg_col, subtotal_cols=(), file_format=None):
+    """Load only the columns the pivot touches, with compact dtypes."""
+    with span("load") as load_span:
+        usecols, dtype = plan_columns(file_path, filters, group_cols, agg_func, agg_col, subtotal_cols, file_format)
+        df = downcast_integers(load_data(file_path, usecols=usecols, dtype=dtype, file_format=file_format), [agg_col])
+        load_span.rows_out = len(df)
+    return df
+
+
+def decategorize(df):
+    for col in df.select_dtypes("category").columns:
+        df[col] = df[col].astype(df[col].cat.categories.dtype)
     return df
 
 
-def group_data(df, group_cols, agg_func):
+def apply_filters(df, filters):
+    return apply_compiled_filters(df, compile_filters(filters))
+
+
+def group_data(df, group_cols, agg_func, agg_col=None):
+    """Group the rows, aggregating only `agg_col` when given and every other column otherwise."""
     if agg_func == "count":
-        return df.groupby(group_cols).size().reset_index(name="Count")
+        grouped = df.groupby(group_cols, observed=True).size().reset_index(name="Count")
+    elif agg_col is not None:
+        grouped = df.groupby(group_cols, observed=True)[[agg_col]].agg(agg_func).reset_index()
     else:
-        return df.groupby(group_cols).agg(agg_func).reset_index()
+        grouped = df.groupby(group_cols, observed=True).agg(agg_func).reset_index()
+    return decategorize(grouped)
 
 
-def preprocess_data(df, filters, group_cols, agg_func):
-    missing_filters = [f for f in filters if f not in df.columns]
+def validate_columns(columns, filters, group_cols):
+    missing_filters = [f for f in filters if f not in columns]
     if missing_filters:
         raise ValueError(f"Filter columns {missing_filters} not found in data.")
 
-    missing_groups = [g for g in group_cols if g not in df.columns]
+    missing_groups = [g for g in group_cols if g not in columns]
     if missing_groups:
         raise ValueError(f"Group columns {missing_groups} not found in data.")
 
-    filtered_data = apply_filters(df, filters)
-    grouped_data = group_data(filtered_data, group_cols, agg_func)
+
+def preprocess_data(df, filters, group_cols, agg_func, agg_col=None):
+    validate_columns(df.columns, filters, group_cols)
+
+    with span("filter", rows_in=len(df)) as filter_span:
+        filtered_data = apply_filters(df, filters)
+        filter_span.rows_out = len(filtered_data)
+    with span("group", rows_in=len(filtered_data)) as group_span:
+        grouped_data = group_data(filtered_data, group_cols, agg_func, agg_col)
+        group_span.rows_out = len(grouped_data)
 
     return grouped_data
 
@@ -53,49 +121,133 @@ def add_grand_total(subtotals, subtotal_col, agg_col):
     return pd.DataFrame([grand_total_row], columns=subtotal_col + [agg_col])
 
 
-def prepare_subtotal_rows(grouped_data, subtotal_cols, agg_col):
-    subtotals = calculate_subtotals(grouped_data, subtotal_cols, agg_col)
-    subtotals_primary = calculate_subtotals(grouped_data, subtotal_cols[:1], agg_col)
+def calculate_rollup(grouped_data, subtotal_cols, agg_col):
+    """Return the subtotals for every prefix of `subtotal_cols`, keyed by prefix length.
 
-    grouped_data["key"] = grouped_data[subtotal_cols].agg(tuple, axis=1)
-    subtotals["key"] = subtotals[subtotal_cols].agg(tuple, axis=1)
-    subtotals_primary["key"] = subtotals_primary[subtotal_cols[0]].apply(lambda x: (x,))
+    Only the finest level is aggregated from the grouped rows; each coarser level is rolled up from the
+    level below it, so the grouped rows are scanned once regardless of depth.
+    """
+    rollup = {len(subtotal_cols): calculate_subtotals(grouped_data, subtotal_cols, agg_col)}
+    for level in range(len(subtotal_cols) - 1, 0, -1):
+        rollup[level] = calculate_subtotals(rollup[level + 1], subtotal_cols[:level], agg_col)
+    return rollup
 
-    rows_to_concat = []
-    for key, group_data in grouped_data.groupby(subtotal_cols[0]):
-        subtotal_row_primary = subtotals_primary[subtotals_primary["key"] == (key,)]
-        rows_to_concat.append(subtotal_row_primary)
 
-        if len(subtotal_cols) > 1:
-            for _, sub_group_data in group_data.groupby(subtotal_cols[1:]):
-                sub_key = sub_group_data["key"].iloc[0]
-                subtotal_row = subtotals[subtotals["key"] == sub_key]
-                rows_to_concat.extend([subtotal_row, sub_group_data])
-        else:
-            rows_to_concat.append(group_data)
+def rank_columns(df, subtotal_cols, level, other_last=False):
+    """Sort key columns for a frame at `level`: the group rank of each prefix, -1 below the level.
 
-    final_data = pd.concat(rows_to_concat, ignore_index=True)
-    final_data.drop(columns=["key"], inplace=True)
+    With `other_last`, an OTHER_LABEL group ranks after its siblings.
+    """
+    def keys(prefix):
+        if not other_last:
+            return prefix
+        return [key for col in prefix for key in (df[col].eq(OTHER_LABEL).rename(f"_other_{col}"), df[col])]
 
-    columns = [col for col in final_data.columns if col != agg_col] + [agg_col]
-    final_data = final_data[columns]
+    return {f"_level_{i}": df.groupby(keys(subtotal_cols[:i])).ngroup() if i <= level else -1
+            for i in range(1, len(subtotal_cols) + 1)}
 
-    return final_data
 
+def prepare_subtotal_rows(grouped_data, subtotal_cols, agg_col, rollup=None, other_last=False):
+    """Interleave the rollup subtotals with the grouped rows in a single concat and stable sort.
 
-def calculate_totals(grouped_data, subtotal_cols, agg_col):
-    original_agg_sum = grouped_data[agg_col].sum()
+    Every row gets a sort key made of its group rank at each subtotal level plus its row position. Subtotal
+    rows use -1 for the levels below their own, so each one sorts before the rows it summarizes. `rollup`
+    defaults to `calculate_rollup` of the grouped rows; `other_last` is passed to `rank_columns`.
+    """
+    depth = len(subtotal_cols)
+    sort_cols = [f"_level_{i}" for i in range(1, depth + 1)] + ["_row"]
 
-    if subtotal_cols:
-        final_data = prepare_subtotal_rows(grouped_data, subtotal_cols, agg_col)
+    blocks = [subtotals.assign(**rank_columns(subtotals, subtotal_cols, level, other_last), _row=-1,
+                               **{SUBTOTAL_LEVEL_COL: level})
+              for level, subtotals in (rollup or calculate_rollup(grouped_data, subtotal_cols, agg_col)).items()]
+    rows = grouped_data.assign(**rank_columns(grouped_data, subtotal_cols, depth, other_last),
+                               _row=np.arange(len(grouped_data)), **{SUBTOTAL_LEVEL_COL: None})
+    blocks.append(rows[rows[sort_cols[-2]] >= 0])
+
+    final_data = pd.concat(blocks, ignore_index=True)
+    final_data = final_data.sort_values(sort_cols, kind="stable", ignore_index=True)
+
+    columns = subtotal_cols + [col for col in grouped_data.columns if col not in subtotal_cols and col != agg_col]
+    return final_data[columns + [agg_col, SUBTOTAL_LEVEL_COL]]
+
+
+def fold_level(grouped_data, parent_cols, child_cols, agg_col, top_n):
+    """Relabel the children of each parent outside its `top_n` largest as OTHER_LABEL, returning the relabeled
+    rows and a mask of the rows that were."""
+    child_ids = grouped_data.groupby(parent_cols + child_cols, sort=False).ngroup().to_numpy()
+    totals = grouped_data[agg_col].groupby(child_ids).sum()
+    if parent_cols:
+        parent_ids = grouped_data.groupby(parent_cols, sort=False).ngroup().groupby(child_ids).first()
+        ranks = totals.groupby(parent_ids).rank(method="first", ascending=False)
     else:
-        final_data = grouped_data
+        ranks = totals.rank(method="first", ascending=False)
+    folded = (ranks > top_n).to_numpy()[child_ids]
+    if not folded.any():
+        return grouped_data, folded
+    return grouped_data.assign(**{col: other_labeled(grouped_data[col], folded) for col in child_cols}), folded
+
+
+def other_labeled(values, folded):
+    """Replace the `folded` values by OTHER_LABEL, adding it to the categories of a category column."""
+    if isinstance(values.dtype, pd.CategoricalDtype) and OTHER_LABEL not in values.cat.categories:
+        values = values.cat.add_categories([OTHER_LABEL])
+    return values.where(~folded, OTHER_LABEL)
+
+
+def limit_groups(grouped_data, subtotal_cols, agg_col, top_n):
+    """Keep the `top_n` largest groups of each parent, level by level, folding the others into an OTHER_LABEL group.
+
+    Each subtotal column is limited within the groups of the columns before it, then the grouped rows within
+    the deepest subtotal groups. Groups are ranked by their summed `agg_col`, ties going to the first in grouped
+    order. Folded groups are combined by summing, as subtotal rows are, so every subtotal and the grand total keep
+    their values.
+    """
+    if isinstance(top_n, bool) or not isinstance(top_n, int) or top_n < 1:
+        raise ValueError(f"top_n must be a positive integer, not {top_n!r}.")
+    detail_cols = [col for col in grouped_data.columns if col not in subtotal_cols and col != agg_col]
+    levels = [[col] for col in subtotal_cols] + ([detail_cols] if detail_cols else [])
+    folded = np.zeros(len(grouped_data), dtype=bool)
+    for depth, child_cols in enumerate(levels):
+        grouped_data, level_folded = fold_level(grouped_data, subtotal_cols[:depth], child_cols, agg_col, top_n)
+        folded |= level_folded
+    if not folded.any():
+        return grouped_data
+
+    # Rows folded into an Other row come last, so it follows the kept rows of its parent once grouped.
+    group_cols = [col for col in grouped_data.columns if col != agg_col]
+    if detail_cols:
+        grouped_data = grouped_data.iloc[np.argsort(level_folded, kind="stable")]
+    return grouped_data.groupby(group_cols, sort=False)[agg_col].sum().reset_index()
+
+
+def calculate_totals(grouped_data, subtotal_cols, agg_col, rollup=None, top_n=None):
+    """Add rollup subtotal rows and a grand total row, with each row's level in `SUBTOTAL_LEVEL_COL`.
+
+    Levels are 0 for the grand total, 1..len(subtotal_cols) for subtotals and None for grouped rows. With
+    `top_n`, the grouped rows are first limited by `limit_groups`.
+    """
+    if top_n is not None:
+        with span("top_n", rows_in=len(grouped_data)) as limit_span:
+            limited = limit_groups(grouped_data, subtotal_cols, agg_col, top_n)
+            limit_span.rows_out = len(limited)
+        # A rollup of the full rows has no Other groups.
+        if limited is not grouped_data:
+            grouped_data, rollup = limited, None
+    with span("totals", rows_in=len(grouped_data)) as totals_span:
+        original_agg_sum = grouped_data[agg_col].sum()
+
+        if subtotal_cols:
+            final_data = prepare_subtotal_rows(grouped_data, subtotal_cols, agg_col, rollup, top_n is not None)
+        else:
+            final_data = grouped_data.assign(**{SUBTOTAL_LEVEL_COL: None})
 
-    grand_total_row = pd.DataFrame([{agg_col: original_agg_sum,
-                                     subtotal_cols[0] if subtotal_cols else final_data.columns[0]: 'Grand Total'}])
-    final_data = pd.concat([final_data, grand_total_row], ignore_index=True)
+        grand_total_row = pd.DataFrame([{agg_col: original_agg_sum,
+                                         subtotal_cols[0] if subtotal_cols else final_data.columns[0]: 'Grand Total',
+                                         SUBTOTAL_LEVEL_COL: 0}])
+        final_data = pd.concat([final_data, grand_total_row], ignore_index=True)
 
-    columns = [col for col in final_data.columns if col != agg_col] + [agg_col]
-    final_data = final_data[columns]
+        columns = [col for col in final_data.columns if col not in (agg_col, SUBTOTAL_LEVEL_COL)]
+        final_data = final_data[columns + [agg_col, SUBTOTAL_LEVEL_COL]]
+        totals_span.rows_out = len(final_data)
 
     return final_data
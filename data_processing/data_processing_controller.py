@@ -1,33 +1,176 @@
-from typing import Dict
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
 from data_validation import validate_csv_path
 from utils.file_utilities import create_file_path
-from dataProcessing import load_data, preprocess_data, calculate_totals
-from output_generation.excel.excelGeneration import save_excel
-from output_generation.pdf.pdfGeneration import dynamic_columns_for_pdf, save_pdf
+from utils.profiling import span
+from dataProcessing import load_projected_data, plan_columns, preprocess_data, calculate_totals
+from streaming_aggregation import DEFAULT_CHUNKSIZE, preprocess_data_streaming, supports_streaming
+from input_formats import detect_format
+from file_formats import is_compressed
+from aggregation_backends import build_backend_final_data, use_external_backend
+from incremental_aggregation import preprocess_data_incremental
+from parallel_aggregation import preprocess_data_parallel
+from result_cache import cached_result
+from rendered_pivot import pivot_columns, render_pivot
+from output_generation.outputFormats import DEFAULT_FORMATS, get_renderer, output_extension, selected_formats
 import logging
 
 logger = logging.getLogger(__name__)
 
+STREAMING_THRESHOLD_MB = 1024
+PARALLEL_THRESHOLD_MB = 64
 
-def process_data_and_generate_files(config: Dict, generate_files: bool = True) -> None:
+
+def is_csv_input(csv_path: str, data_config: Dict) -> bool:
+    return detect_format(csv_path, data_config.get("input_format")) == "csv"
+
+
+def is_plain_csv_input(csv_path: str, data_config: Dict) -> bool:
+    """True for uncompressed CSV text, which can be split and resumed at byte offsets."""
+    return is_csv_input(csv_path, data_config) and not is_compressed(csv_path)
+
+
+def use_streaming(csv_path: str, data_config: Dict) -> bool:
+    # Columnar inputs are already read column by column; chunked streaming only applies to CSV text.
+    if not is_csv_input(csv_path, data_config):
+        return False
+    threshold_mb = data_config.get("streaming_threshold_mb", STREAMING_THRESHOLD_MB)
+    if os.path.getsize(csv_path) <= threshold_mb * 1024 * 1024:
+        return False
+    if not supports_streaming(data_config["agg_func"]):
+        logger.warning(f"Aggregation '{data_config['agg_func']}' cannot be streamed; loading the whole file.")
+        return False
+    return True
+
+
+def use_incremental(data_config: Dict) -> bool:
+    if not data_config.get("incremental", False):
+        return False
+    if not is_plain_csv_input(data_config["csv_file_path"], data_config):
+        logger.warning("Incremental mode only applies to uncompressed, append-only CSV files; "
+                       "loading the whole file.")
+        return False
+    if not supports_streaming(data_config["agg_func"]):
+        logger.warning(f"Aggregation '{data_config['agg_func']}' cannot be updated incrementally; "
+                       f"loading the whole file.")
+        return False
+    return True
+
+
+def parse_workers(csv_path: str, data_config: Dict) -> int:
+    """Number of processes that parse the CSV in parallel; 1 keeps the single-process path."""
+    if not is_plain_csv_input(csv_path, data_config) or not supports_streaming(data_config["agg_func"]):
+        return 1
+    threshold_mb = data_config.get("parallel_threshold_mb", PARALLEL_THRESHOLD_MB)
+    if os.path.getsize(csv_path) < threshold_mb * 1024 * 1024:
+        return 1
+    return data_config.get("parse_workers", os.cpu_count() or 1)
+
+
+def load_processed_data(csv_path: str, data_config: Dict, datasets=None):
+    params = {k: data_config[k] for k in ["filters", "group_cols", "agg_func"]}
+    projection = dict(agg_col=data_config["agg_col"], subtotal_cols=data_config["subtotal_col"],
+                      file_format=data_config.get("input_format"), **params)
+    if use_incremental(data_config):
+        usecols, dtype = plan_columns(csv_path, **projection)
+        with span("incremental_aggregate") as aggregate_span:
+            grouped = preprocess_data_incremental(csv_path, agg_col=data_config["agg_col"], data_config=data_config,
+                                                  chunksize=data_config.get("chunksize", DEFAULT_CHUNKSIZE),
+                                                  usecols=usecols, dtype=dtype, **params)
+            aggregate_span.rows_out = None if grouped is None else len(grouped)
+        return grouped
+    workers = parse_workers(csv_path, data_config) if datasets is None else 1
+    if workers > 1:
+        usecols, dtype = plan_columns(csv_path, **projection)
+        with span("parallel_aggregate") as aggregate_span:
+            # Files past the streaming threshold accept merged partial sums, as the streaming path does.
+            grouped = preprocess_data_parallel(csv_path, agg_col=data_config["agg_col"], workers=workers,
+                                               exact=not use_streaming(csv_path, data_config),
+                                               chunksize=data_config.get("chunksize", DEFAULT_CHUNKSIZE),
+                                               usecols=usecols, dtype=dtype, **params)
+            aggregate_span.rows_out = None if grouped is None else len(grouped)
+        if grouped is not None:
+            return grouped
+    if use_streaming(csv_path, data_config):
+        logger.info("Large CSV file detected, aggregating in streaming mode.")
+        usecols, dtype = plan_columns(csv_path, **projection)
+        with span("stream_aggregate") as aggregate_span:
+            grouped = preprocess_data_streaming(csv_path, agg_col=data_config["agg_col"],
+                                                chunksize=data_config.get("chunksize", DEFAULT_CHUNKSIZE),
+                                                usecols=usecols, dtype=dtype, **params)
+            aggregate_span.rows_out = None if grouped is None else len(grouped)
+        return grouped
+
+    # A long-lived process keeps its parsed files in a `DatasetCache`; the frame then already holds the columns.
+    df = datasets.get(csv_path, data_config) if datasets is not None else None
+    if df is None:
+        df = load_projected_data(csv_path, **projection)
+    if df.empty:
+        return None
+    return preprocess_data(df, agg_col=data_config["agg_col"], **params)
+
+
+def build_final_data(csv_path: str, data_config: Dict, datasets=None):
+    """Return the pivot with subtotal and grand total rows, or None when there is no data."""
+    if use_external_backend(data_config):
+        return build_backend_final_data(csv_path, data_config)
+    processed_data = load_processed_data(csv_path, data_config, datasets)
+    if processed_data is None:
+        return None
+    return calculate_totals(processed_data, data_config["subtotal_col"], data_config["agg_col"],
+                            top_n=data_config.get("top_n"))
+
+
+def load_final_data(config: Dict, use_cache: bool = True, datasets=None):
+    """Return the report's pivot with totals, from the result cache when possible, or None when there is no data."""
+    csv_path = config["data"]["csv_file_path"]
+    validate_csv_path(csv_path)
+    # Incremental reports already skip the rows seen before; hashing the whole CSV for the cache would not.
+    use_cache = use_cache and not use_incremental(config["data"])
+    cache_config = config.get("cache") if use_cache else {"enabled": False}
+    return cached_result(csv_path, config["data"], cache_config,
+                         lambda: build_final_data(csv_path, config["data"], datasets))
+
+
+def generate_output_files(final_data, csv_path: str, dynamic_columns, styles: Dict, jobs: int = 1,
+                          report_name: str = "PivotTable", formats: Optional[List[str]] = None) -> None:
+    """Render every requested output file from one rendered pivot, in separate worker processes when more than
+    one job is allowed."""
+    write_output_files(render_pivot(final_data, dynamic_columns), csv_path, styles, jobs, report_name, formats)
+
+
+def write_output_files(pivot, csv_path: str, styles: Dict, jobs: int = 1, report_name: str = "PivotTable",
+                       formats: Optional[List[str]] = None) -> None:
+    outputs = {file_type: (create_file_path(csv_path, output_extension(file_type), report_name),
+                           get_renderer(file_type))
+               for file_type in formats or DEFAULT_FORMATS}
+
+    if jobs <= 1:
+        for file_type, (file_path, renderer) in outputs.items():
+            renderer(pivot, file_path, styles)
+            logger.info(f"{file_type.upper()} file built successfully.")
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(outputs))) as executor:
+        futures = {file_type: executor.submit(renderer, pivot, file_path, styles)
+                   for file_type, (file_path, renderer) in outputs.items()}
+        for file_type, future in futures.items():
+            future.result()
+            logger.info(f"{file_type.upper()} file built successfully.")
+
+
+def process_data_and_generate_files(config: Dict, generate_files: bool = True, jobs: int = 1,
+                                    use_cache: bool = True, formats: Optional[List[str]] = None) -> None:
     try:
-        csv_path = config["data"]["csv_file_path"]
-        validate_csv_path(csv_path)
-        df, file_data = load_data(csv_path), {"pdf": "pdf", "excel": "xlsx"}
-        if df.empty:
+        formats = selected_formats(config, formats)
+        final_data = load_final_data(config, use_cache)
+        if final_data is None:
             logger.warning("No data found in the CSV file.")
             return
 
-        processed_data = preprocess_data(df, **{k: config["data"][k] for k in ["filters", "group_cols", "agg_func"]})
-        final_data = calculate_totals(processed_data, config["data"]["subtotal_col"], config["data"]["agg_col"])
-        dynamic_columns = dynamic_columns_for_pdf(config["data"]["group_cols"], config["data"]["agg_col"])
-
-        for file_type, extension in file_data.items():
-            file_path = create_file_path(csv_path, extension)
-            if file_type == "pdf":
-                save_pdf(final_data, file_path, dynamic_columns, config["styles"])
-            else:
-                save_excel(final_data, file_path, dynamic_columns, config["styles"])
-            logger.info(f"{file_type.upper()} file built successfully.")
-    except KeyError as e:
+        dynamic_columns = pivot_columns(config["data"]["group_cols"], config["data"]["agg_col"])
+        generate_output_files(final_data, config["data"]["csv_file_path"], dynamic_columns, config["styles"], jobs,
+                              formats=formats)
+    except (KeyError, ValueError) as e:
         logger.error(f"Error processing data: {str(e)}")
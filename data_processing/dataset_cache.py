@@ -0,0 +1,121 @@
+"""In-memory LRU cache of loaded input frames, for processes that build many reports over the same files."""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+from dataProcessing import downcast_integers, load_data, plan_columns, required_columns
+from input_formats import detect_format
+from utils.profiling import span
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 1024
+
+
+def file_signature(file_path: str):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DatasetCache:
+    """Keep the projected frame of each input file, bounded by the total memory the frames use.
+
+    A frame is reused while the file keeps its size and mtime and it holds every column a report needs;
+    otherwise the file is reloaded with the union of the cached and the requested columns, so reports over
+    one file converge on a single frame. The least recently used frames are evicted first.
+    """
+
+    def __init__(self, max_mb: float = DEFAULT_MAX_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.entries = OrderedDict()
+        # The lock only guards the entries and counters; files are loaded outside it, one load per path at a
+        # time, with the Event of the load in progress kept here for other readers of that path to wait on.
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.nbytes = 0
+        self.hits = self.misses = 0
+
+    def get(self, file_path: str, data_config: Dict):
+        """Return a frame holding the columns `data_config` needs, or None when they cannot be planned."""
+        file_format = detect_format(file_path, data_config.get("input_format"))
+        required = required_columns(data_config["filters"], data_config["group_cols"], data_config["agg_func"],
+                                    data_config["agg_col"], data_config["subtotal_col"])
+        signature = file_signature(file_path)
+        while True:
+            with self.lock:
+                entry = self.entries.get(file_path)
+                if entry is not None and entry["signature"] != signature:
+                    self.discard(file_path)
+                    entry = None
+                if entry is not None and entry["columns"].issuperset(required):
+                    self.entries.move_to_end(file_path)
+                    self.hits += 1
+                    return entry["df"]
+                in_flight = self.loading.get(file_path)
+                if in_flight is None:
+                    self.loading[file_path] = threading.Event()
+                    break
+            # The frame being loaded may already cover these columns; otherwise it is extended in turn.
+            in_flight.wait()
+
+        try:
+            return self.load(file_path, data_config, file_format, signature, entry)
+        finally:
+            with self.lock:
+                self.loading.pop(file_path).set()
+
+    def load(self, file_path: str, data_config: Dict, file_format: str, signature, entry):
+        usecols, dtype = plan_columns(file_path, data_config["filters"], data_config["group_cols"],
+                                      data_config["agg_func"], data_config["agg_col"],
+                                      data_config["subtotal_col"], file_format)
+        if usecols is None:
+            return None
+        agg_cols = {data_config["agg_col"]}
+        if entry is not None:
+            if entry["columns"].issuperset(usecols):
+                with self.lock:
+                    if file_path in self.entries:
+                        self.entries.move_to_end(file_path)
+                    self.hits += 1
+                return entry["df"]
+            usecols = list(dict.fromkeys([*entry["usecols"], *usecols]))
+            dtype = {**entry["dtype"], **dtype}
+            agg_cols |= entry["agg_cols"]
+
+        with span("load") as load_span:
+            df = downcast_integers(load_data(file_path, usecols=usecols, dtype=dtype, file_format=file_format),
+                                   list(agg_cols))
+            load_span.rows_out = len(df)
+        with self.lock:
+            self.misses += 1
+            if not df.empty:
+                self.store(file_path, dict(signature=signature, usecols=usecols, columns=set(usecols), dtype=dtype,
+                                           agg_cols=agg_cols, df=df, nbytes=int(df.memory_usage(deep=True).sum())))
+        return df
+
+    def store(self, file_path: str, entry: Dict) -> None:
+        self.discard(file_path)
+        if entry["nbytes"] > self.max_bytes:
+            logger.info(f"{file_path} takes {entry['nbytes'] / 1024 / 1024:.0f} MB, more than the dataset cache "
+                        f"holds; not caching it.")
+            return
+        self.entries[file_path] = entry
+        self.nbytes += entry["nbytes"]
+        while self.nbytes > self.max_bytes:
+            evicted, evicted_entry = self.entries.popitem(last=False)
+            self.nbytes -= evicted_entry["nbytes"]
+            logger.info(f"Evicted {evicted} from the dataset cache.")
+
+    def discard(self, file_path: str) -> None:
+        entry = self.entries.pop(file_path, None)
+        if entry is not None:
+            self.nbytes -= entry["nbytes"]
+
+    def size(self) -> int:
+        return self.nbytes
+
+    def stats(self) -> Dict:
+        """Read without the lock, so a caller such as an event loop never waits on a load in progress."""
+        return {"files": len(self.entries), "mb": round(self.nbytes / 1024 / 1024, 1),
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,128 @@
+"""DuckDB aggregation backend: a vectorized SQL engine that spills to disk when `memory_limit` is exceeded.
+
+`backend_options` are passed to the connection, e.g. {"memory_limit": "4GB", "threads": 8,
+"temp_directory": "/tmp/duckdb"}.
+"""
+from contextlib import contextmanager
+import duckdb
+from duckdb import ColumnExpression, ConstantExpression, FunctionExpression
+from input_formats import read_arrow_table
+
+AGGREGATIONS = {"sum", "mean", "min", "max", "median", "std", "var", "nunique"}
+
+AGGREGATE_FUNCTIONS = {
+    "mean": "avg({})",
+    "min": "min({})",
+    "max": "max({})",
+    "median": "quantile_cont({}, 0.5)",
+    "std": "stddev_samp({})",
+    "var": "var_samp({})",
+    "nunique": "count(DISTINCT {})",
+}
+
+# Restricting CSV type detection to these keeps column types in line with `pd.read_csv`.
+CSV_TYPE_CANDIDATES = ["BIGINT", "DOUBLE", "VARCHAR"]
+# The CSV reader coerces values that do not fit a sampled type (1.5 is read as 2 in a BIGINT column), so
+# types are always inferred from every row and there is no error to retry on.
+TYPE_INFERENCE_ERRORS = ()
+INTEGER_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER",
+                 "UBIGINT"}
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+@contextmanager
+def session(options):
+    """Open the connection every step runs on, so its memory, thread and spill settings apply throughout."""
+    with duckdb.connect(config=options) as connection:
+        yield connection
+
+
+def load(connection, file_path, file_format, columns, infer_all_rows=True):
+    if file_format == "csv":
+        relation = connection.read_csv(file_path, sample_size=-1, auto_type_candidates=CSV_TYPE_CANDIDATES)
+    elif file_format == "parquet":
+        relation = connection.read_parquet(file_path)
+    else:
+        relation = connection.from_arrow(read_arrow_table(file_path, file_format, columns))
+    return relation.select(*(ColumnExpression(column) for column in columns))
+
+
+def predicate_expr(column, operator, value):
+    """Translate one predicate, keeping pandas semantics for missing values.
+
+    Regex patterns are run by RE2, which has no lookarounds or backreferences and rejects such patterns.
+    """
+    col = ColumnExpression(column)
+    if operator in ("in", "not_in"):
+        matches = col.isin(*(ConstantExpression(item) for item in value))
+        return matches if operator == "in" else ~matches | col.isnull()
+    if operator == "between":
+        return col.between(ConstantExpression(value[0]), ConstantExpression(value[1]))
+    if operator == "regex":
+        return FunctionExpression("regexp_matches", col.cast(duckdb.sqltype("VARCHAR")),
+                                  ConstantExpression(value.pattern))
+    if operator == "is_null":
+        return col.isnull() if value else col.isnotnull()
+    if operator == "ne":
+        return (col != ConstantExpression(value)) | col.isnull()
+    comparisons = {"eq": col.__eq__, "gt": col.__gt__, "ge": col.__ge__, "lt": col.__lt__, "le": col.__le__}
+    return comparisons[operator](ConstantExpression(value))
+
+
+def filter_rows(data, predicates):
+    for predicate in predicates:
+        data = data.filter(predicate_expr(*predicate))
+    return data
+
+
+def sum_sql(column, column_type):
+    # SUM widens integers to HUGEINT, which pandas would receive as floats.
+    total = f"sum({quote(column)})"
+    return f"CAST({total} AS BIGINT)" if column_type in INTEGER_TYPES else total
+
+
+def column_type(data, column):
+    return str(dict(zip(data.columns, data.types))[column])
+
+
+def group(data, group_cols, agg_func, agg_col):
+    for column in group_cols:
+        data = data.filter(ColumnExpression(column).isnotnull())
+    keys = ", ".join(quote(column) for column in group_cols)
+    if agg_func == "count":
+        return data.aggregate(f"{keys}, count(*) AS \"Count\"", keys)
+    if agg_func == "sum":
+        aggregate = sum_sql(agg_col, column_type(data, agg_col))
+    else:
+        aggregate = AGGREGATE_FUNCTIONS[agg_func].format(quote(agg_col))
+    return data.aggregate(f"{keys}, {aggregate} AS {quote(agg_col)}", keys)
+
+
+def sort(data, columns):
+    return data.order(", ".join(quote(column) for column in columns))
+
+
+def collect(connection, data):
+    """Run the query once; later steps read the materialized grouped rows instead of rescanning the input."""
+    return connection.from_arrow(data.to_arrow_table())
+
+
+def rollup(connection, grouped, subtotal_cols, agg_col):
+    """Compute every subtotal level in one GROUP BY ROLLUP pass over the grouped rows."""
+    depth = len(subtotal_cols)
+    keys = ", ".join(quote(column) for column in subtotal_cols)
+    query = (f"SELECT {keys}, {sum_sql(agg_col, column_type(grouped, agg_col))} AS {quote(agg_col)}, "
+             f"GROUPING({keys}) AS _grouping FROM grouped GROUP BY ROLLUP ({keys})")
+    result = collect(connection, grouped.query("grouped", query))
+
+    # GROUPING sets one bit per rolled-up column, so level L leaves the last depth - L bits set.
+    return {level: result.filter(ColumnExpression("_grouping") == ConstantExpression((1 << (depth - level)) - 1))
+            .select(*(ColumnExpression(column) for column in subtotal_cols[:level] + [agg_col]))
+            for level in range(1, depth + 1)}
+
+
+def to_pandas(data):
+    return data.df()
@@ -0,0 +1,31 @@
+"""Input file formats, kept free of pandas and pyarrow imports so the CLI can resolve them cheaply."""
+import os
+
+EXTENSION_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+}
+COLUMNAR_FORMATS = {"parquet", "feather", "arrow"}
+INPUT_FORMATS = COLUMNAR_FORMATS | {"csv"}
+# Suffixes pandas decompresses on the fly; such files can be read whole or in chunks but not by byte offset.
+COMPRESSED_SUFFIXES = {".gz", ".bz2", ".zip", ".xz", ".zst", ".tar"}
+
+
+def format_from_path(file_path, file_format=None):
+    """Return the input format from the explicit setting or the file extension.
+
+    Files with any other extension, such as .txt, .tsv or .csv.gz, are read as CSV like they always were.
+    """
+    if file_format is None:
+        return EXTENSION_FORMATS.get(os.path.splitext(file_path)[1].lower(), "csv")
+    if file_format not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported input_format '{file_format}'; expected one of {sorted(INPUT_FORMATS)}.")
+    return file_format
+
+
+def is_compressed(file_path):
+    return os.path.splitext(file_path)[1].lower() in COMPRESSED_SUFFIXES
@@ -0,0 +1,113 @@
+import re
+import numpy as np
+import pandas as pd
+
+SELECTIVITY_SAMPLE_ROWS = 1_000
+
+
+def matches_regex(values, pattern):
+    if not (pd.api.types.is_string_dtype(values) or values.dtype == object):
+        values = values.astype(str)
+    return values.str.contains(pattern, regex=True, na=False)
+
+
+OPERATORS = {
+    "eq": lambda values, value: values == value,
+    "ne": lambda values, value: values != value,
+    "in": lambda values, value: values.isin(value),
+    "not_in": lambda values, value: ~values.isin(value),
+    "gt": lambda values, value: values > value,
+    "ge": lambda values, value: values >= value,
+    "lt": lambda values, value: values < value,
+    "le": lambda values, value: values <= value,
+    "between": lambda values, value: values.between(value[0], value[1]),
+    "regex": matches_regex,
+    "is_null": lambda values, value: values.isna() == value,
+}
+
+# Result of each operator for a missing value, used when evaluating per category.
+NULL_RESULTS = {"ne": True, "not_in": True}
+
+
+def compile_predicate(column, operator, value):
+    if operator not in OPERATORS:
+        raise ValueError(f"Unknown filter operator '{operator}' for column '{column}'; "
+                         f"expected one of {sorted(OPERATORS)}.")
+    if operator in ("in", "not_in") and not isinstance(value, (list, tuple, set)):
+        raise ValueError(f"Filter '{operator}' on column '{column}' expects a list of values.")
+    if operator == "between" and (not isinstance(value, (list, tuple)) or len(value) != 2):
+        raise ValueError(f"Filter 'between' on column '{column}' expects [low, high].")
+    if operator == "regex":
+        try:
+            value = re.compile(value)
+        except re.error as e:
+            raise ValueError(f"Invalid regex filter on column '{column}': {e}")
+    if operator == "is_null":
+        value = bool(value)
+    return column, operator, value
+
+
+def compile_filters(filters):
+    """Turn the `filters` config into a list of (column, operator, value) predicates.
+
+    A filter value is either a scalar (equality), a list (membership) or a mapping of operators to
+    operands, e.g. {"ge": 10, "lt": 20} or {"regex": "^timeout"}, all of which must hold.
+    """
+    predicates = []
+    for column, spec in filters.items():
+        if isinstance(spec, dict):
+            predicates.extend(compile_predicate(column, operator, value) for operator, value in spec.items())
+        elif isinstance(spec, (list, tuple)):
+            predicates.append(compile_predicate(column, "in", spec))
+        else:
+            predicates.append(compile_predicate(column, "eq", spec))
+    return predicates
+
+
+def to_mask(result):
+    if isinstance(result, pd.Series):
+        return result.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(result, dtype=bool)
+
+
+def evaluate(values, operator, value):
+    """Return the boolean mask of a predicate over a Series."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Evaluate once per category, then look the result up through the codes; code -1 (missing) picks the
+        # appended null result.
+        per_category = to_mask(OPERATORS[operator](pd.Series(values.cat.categories), value))
+        null_result = value if operator == "is_null" else NULL_RESULTS.get(operator, False)
+        return np.append(per_category, null_result)[values.cat.codes.to_numpy()]
+    return to_mask(OPERATORS[operator](values, value))
+
+
+def order_by_selectivity(df, predicates):
+    """Order predicates by the share of rows they keep in an evenly spread sample, most selective first."""
+    if len(predicates) < 2 or len(df) <= SELECTIVITY_SAMPLE_ROWS:
+        return predicates
+    positions = np.linspace(0, len(df) - 1, SELECTIVITY_SAMPLE_ROWS).astype(np.intp)
+    sample = df.take(positions)
+    pass_rates = [evaluate(sample[column], operator, value).mean() for column, operator, value in predicates]
+    return [predicates[i] for i in np.argsort(pass_rates, kind="stable")]
+
+
+def apply_compiled_filters(df, predicates):
+    """Keep the rows matching every predicate, materializing the filtered frame once.
+
+    Each predicate after the first is only evaluated on the rows that are still selected.
+    """
+    if not predicates or df.empty:
+        return df
+
+    positions = None
+    for column, operator, value in order_by_selectivity(df, predicates):
+        if positions is None:
+            positions = np.flatnonzero(evaluate(df[column], operator, value))
+        else:
+            positions = positions[evaluate(df[column].take(positions), operator, value)]
+        if len(positions) == 0:
+            break
+
+    if len(positions) == len(df):
+        return df
+    return df.take(positions)
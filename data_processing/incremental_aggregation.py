@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import pickle
+import pandas as pd
+from dataProcessing import validate_columns
+from filter_engine import apply_compiled_filters, compile_filters
+from streaming_aggregation import (DEFAULT_CHUNKSIZE, finalize_partial, merge_partials, partial_aggregate,
+                                   read_csv_range, supports_streaming)
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pivot_tables", "incremental")
+PREFIX_SAMPLES = 16
+PREFIX_SAMPLE_SIZE = 4096
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+QUOTE_CHAR = b'"'
+
+# Data settings that do not change which rows are aggregated or how.
+NON_STATE_KEYS = {"csv_file_path", "chunksize", "streaming_threshold_mb", "incremental", "incremental_state_dir",
+                   "parse_workers", "parallel_threshold_mb", "top_n"}
+
+
+def state_path(csv_path, data_config):
+    """Return where the aggregation state of this CSV and data config is kept."""
+    canonical = {k: v for k, v in data_config.items() if k not in NON_STATE_KEYS}
+    payload = json.dumps({"file": os.path.abspath(csv_path), "data": canonical}, sort_keys=True, default=str)
+    key = hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+    return os.path.join(os.path.expanduser(data_config.get("incremental_state_dir", DEFAULT_STATE_DIR)), key + ".pkl")
+
+
+def prefix_checksum(file_path, offset):
+    """Hash the header and evenly spaced blocks of the first `offset` bytes, always including the last block."""
+    digest = hashlib.blake2b(digest_size=20)
+    step = max(offset // PREFIX_SAMPLES, 1)
+    positions = sorted({min(i * step, max(offset - PREFIX_SAMPLE_SIZE, 0)) for i in range(PREFIX_SAMPLES)}
+                       | {max(offset - PREFIX_SAMPLE_SIZE, 0)})
+    with open(file_path, "rb") as file:
+        for position in positions:
+            file.seek(position)
+            digest.update(file.read(min(PREFIX_SAMPLE_SIZE, offset - position)))
+    return digest.hexdigest()
+
+
+def complete_rows_end(file_path, start, size):
+    """Return the offset just past the last newline after `start` that ends a record, with the quotes since
+    `start` balanced, or `start` when there is none.
+
+    Rows after it may still be appended to, so they are aggregated into each run's result but never into the
+    saved state.
+    """
+    end, quotes, position = start, 0, start
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        while position < size:
+            block = file.read(min(SCAN_BLOCK_SIZE, size - position))
+            if not block:
+                break
+            # Walk back from the end of the block, usually stopping at its last newline.
+            block_quotes = block.count(QUOTE_CHAR)
+            parity, cursor = quotes + block_quotes, len(block)
+            while True:
+                newline = block.rfind(b"\n", 0, cursor)
+                if newline == -1:
+                    break
+                parity -= block.count(QUOTE_CHAR, newline, cursor)
+                if parity % 2 == 0:
+                    end = position + newline + 1
+                    break
+                cursor = newline
+            quotes += block_quotes
+            position += len(block)
+    return end
+
+
+def load_state(path):
+    try:
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable incremental state {path}: {e}")
+        return None
+    return state if state.get("version") == STATE_VERSION else None
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def is_valid_prefix(state, file_path, size, columns):
+    """Return True if the bytes aggregated by `state` are still the start of the file."""
+    return (state is not None and state["offset"] <= size and state["columns"] == columns
+            and state["checksum"] == prefix_checksum(file_path, state["offset"]))
+
+
+def preprocess_data_incremental(file_path, filters, group_cols, agg_func, agg_col, data_config,
+                                chunksize=DEFAULT_CHUNKSIZE, usecols=None, dtype=None):
+    """Group an append-only CSV by merging the rows appended since the last run into the saved partial aggregates.
+
+    The state holds the partial aggregates, the byte offset and the row count reached so far. When the already
+    aggregated prefix changed, the state is discarded and the whole file is aggregated again.
+    Returns None when the file could not be read or holds no rows, mirroring an empty `load_data` result.
+    """
+    if not supports_streaming(agg_func):
+        raise ValueError(f"Aggregation '{agg_func}' is not supported in incremental mode.")
+
+    columns = pd.read_csv(file_path, nrows=0).columns
+    validate_columns(columns, filters, group_cols)
+    if agg_func != "count" and agg_col not in columns:
+        raise ValueError(f"Aggregation column '{agg_col}' not found in data.")
+    predicates = compile_filters(filters)
+
+    path = state_path(file_path, data_config)
+    size = os.path.getsize(file_path)
+    state = load_state(path)
+    if not is_valid_prefix(state, file_path, size, list(columns)):
+        if state is not None:
+            logger.info(f"{file_path} changed before the last processed row, rebuilding its aggregates.")
+        with open(file_path, "rb") as file:
+            header_end = len(file.readline())
+        state = {"version": STATE_VERSION, "columns": list(columns), "offset": header_end, "rows": 0,
+                 "partial": None}
+
+    end = complete_rows_end(file_path, state["offset"], size)
+    merged, rows = state["partial"], 0
+    try:
+        for chunk in read_csv_range(file_path, state["offset"], end, columns, chunksize, usecols, dtype):
+            rows += len(chunk)
+            partial = partial_aggregate(apply_compiled_filters(chunk, predicates), group_cols, agg_func, agg_col)
+            merged = partial if merged is None else merge_partials([merged, partial], agg_func)
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return None
+    result = merged
+    # A last row without a trailing newline is reported now and aggregated again once it is terminated; one
+    # still being written, e.g. inside a quoted field, is left for a later run.
+    try:
+        tail = [partial_aggregate(apply_compiled_filters(chunk, predicates), group_cols, agg_func, agg_col)
+                for chunk in read_csv_range(file_path, end, size, columns, chunksize, usecols, dtype)]
+    except (pd.errors.ParserError, ValueError) as e:
+        logger.info(f"Leaving the incomplete last row of {file_path} for a later run: {e}")
+        tail = []
+    if tail:
+        result = merge_partials(tail if result is None else [result, *tail], agg_func)
+
+    if end > state["offset"]:
+        save_state(path, dict(state, offset=end, rows=state["rows"] + rows, partial=merged,
+                              checksum=prefix_checksum(file_path, end)))
+    logger.info(f"Aggregated {rows} new rows of {file_path} ({state['rows'] + rows} in total).")
+
+    if result is None:
+        return None
+    return finalize_partial(result, agg_func, agg_col)
@@ -0,0 +1,85 @@
+import pandas as pd
+from file_formats import COLUMNAR_FORMATS, format_from_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+def detect_format(file_path, file_format=None):
+    """Return the input format from the explicit setting or the file extension, checking it can be read.
+
+    A missing pyarrow is reported as a ValueError, like any other input the config points at but cannot be read.
+    """
+    file_format = format_from_path(file_path, file_format)
+    if file_format in COLUMNAR_FORMATS and pa is None:
+        raise ValueError(f"Reading {file_format} files requires the optional pyarrow package; install it or "
+                         f"convert the input to CSV.")
+    return file_format
+
+
+def open_arrow(file_path):
+    """Open an Arrow IPC file over a memory map, so only the pages of the columns read are touched."""
+    return pa.ipc.open_file(pa.memory_map(file_path, "r"))
+
+
+def read_arrow_table(file_path, file_format, columns=None):
+    """Read a Feather or Arrow IPC file as a pyarrow Table over a memory map."""
+    if file_format == "feather":
+        return feather.read_table(file_path, columns=columns, memory_map=True)
+    table = open_arrow(file_path).read_all()
+    return table if columns is None else table.select(columns)
+
+
+def read_header(file_path, file_format):
+    if file_format == "csv":
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    if file_format == "parquet":
+        return pq.ParquetFile(file_path).schema_arrow.names
+    return open_arrow(file_path).schema.names
+
+
+def read_sample(file_path, file_format, usecols, nrows):
+    """Read the first `nrows` rows of the given columns."""
+    if file_format == "csv":
+        return pd.read_csv(file_path, usecols=usecols, nrows=nrows)
+    if file_format == "parquet":
+        batch = next(pq.ParquetFile(file_path).iter_batches(batch_size=nrows, columns=usecols), None)
+        return pd.DataFrame(columns=usecols) if batch is None else batch.to_pandas()
+    return open_arrow(file_path).read_all().select(usecols).slice(0, nrows).to_pandas()
+
+
+def read_input(file_path, file_format, usecols=None, dtype=None):
+    """Read a whole input file, restricted to `usecols` and cast to `dtype` when given."""
+    if file_format == "csv":
+        return pd.read_csv(file_path, usecols=usecols, dtype=dtype)
+
+    if file_format == "parquet":
+        df = pd.read_parquet(file_path, columns=usecols)
+    else:
+        df = read_arrow_table(file_path, file_format, usecols).to_pandas()
+    return df.astype(dtype) if dtype else df
+
+
+def convert_csv(csv_path, output_path, file_format=None):
+    """Write a CSV to a columnar format, keeping the column types `pd.read_csv` infers.
+
+    Returns the number of rows written.
+    """
+    file_format = detect_format(output_path, file_format)
+    if file_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Cannot convert to {file_format}; expected one of {sorted(COLUMNAR_FORMATS)}.")
+
+    table = pa.Table.from_pandas(pd.read_csv(csv_path), preserve_index=False)
+    if file_format == "parquet":
+        pq.write_table(table, output_path)
+    elif file_format == "feather":
+        feather.write_feather(table, output_path)
+    else:
+        # Left uncompressed so reads straight from the memory map need no decoding.
+        with pa.OSFile(output_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return table.num_rows
@@ -0,0 +1,46 @@
+"""Pandas aggregation backend: the reference implementation of the backend steps, run in memory.
+
+It applies the same filters and grouping as the default pandas path, without that path's streaming, parallel
+and incremental loading, so the other backends can be checked against it step for step.
+"""
+from contextlib import nullcontext
+from dataProcessing import group_data
+from filter_engine import apply_compiled_filters
+from input_formats import read_input
+
+AGGREGATIONS = {"sum", "mean", "min", "max", "median", "std", "var", "nunique"}
+
+TYPE_INFERENCE_ERRORS = ()
+
+
+def session(options):
+    return nullcontext(options)
+
+
+def load(session, file_path, file_format, columns, infer_all_rows=True):
+    return read_input(file_path, file_format, usecols=columns)[columns]
+
+
+def filter_rows(data, predicates):
+    return apply_compiled_filters(data, predicates)
+
+
+def group(data, group_cols, agg_func, agg_col):
+    return group_data(data, group_cols, agg_func, None if agg_func == "count" else agg_col)
+
+
+def sort(data, columns):
+    return data.sort_values(columns, ignore_index=True)
+
+
+def collect(session, data):
+    return data
+
+
+def rollup(session, grouped, subtotal_cols, agg_col):
+    return {level: grouped.groupby(subtotal_cols[:level])[agg_col].sum().reset_index()
+            for level in range(1, len(subtotal_cols) + 1)}
+
+
+def to_pandas(data):
+    return data
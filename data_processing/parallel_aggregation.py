@@ -0,0 +1,195 @@
+"""Parse, filter and pre-aggregate a CSV on several cores by splitting it into newline-aligned byte ranges.
+
+Splitting takes two passes over the pool. The first counts the quote characters of evenly sized raw ranges and
+looks, past each split point, for the first newline preceded by an even and by an odd number of quotes. Once
+the quotes before every split point are known, each range starts after the first newline that leaves the
+quotes since the start of the file balanced, so a newline inside a quoted field is never taken for the end of
+a record; when no such newline lies close enough, the file is left to the single-process path. The second pass
+reads, filters and aggregates every range with the helpers of the streaming path, and the parent merges the
+results.
+
+The result matches `preprocess_data` on the whole file exactly, which limits the aggregations parsed in
+parallel: float sums and means merged from partial sums round differently from a single pass, so with `exact`
+those files are left to the single-process path, as are files whose ranges infer different dtypes for a column.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from dataProcessing import validate_columns
+from filter_engine import apply_compiled_filters, compile_filters
+from streaming_aggregation import (DEFAULT_CHUNKSIZE, finalize_partial, merge_partials, partial_aggregate,
+                                   read_csv_range, supports_streaming)
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CHAR = b'"'
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+# How far past a split point the end of the record it falls in is looked for.
+SPLIT_SEARCH_BYTES = 4 * 1024 * 1024
+MIN_RANGE_MB = 32
+# Aggregations whose per-range results merge exactly whatever the type of the aggregated column; sums and means
+# merge exactly only over integer columns.
+EXACT_MERGE_FUNCS = {"count", "min", "max"}
+FLOAT_SAMPLE_ROWS = 1_000
+
+
+def count_quotes(file_path, start, end):
+    quotes = 0
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        while start < end:
+            block = file.read(min(SCAN_BLOCK_SIZE, end - start))
+            if not block:
+                break
+            quotes += block.count(QUOTE_CHAR)
+            start += len(block)
+    return quotes
+
+
+def record_starts_after(file_path, point):
+    """Return the offsets just past the first newline after `point` preceded, counting from `point`, by an even
+    and by an odd number of quotes; an offset is None when no such newline lies within SPLIT_SEARCH_BYTES."""
+    with open(file_path, "rb") as file:
+        file.seek(point)
+        window = file.read(SPLIT_SEARCH_BYTES)
+    found, quotes, position = [None, None], 0, 0
+    while None in found:
+        newline = window.find(b"\n", position)
+        if newline == -1:
+            break
+        quotes += window.count(QUOTE_CHAR, position, newline)
+        if found[quotes % 2] is None:
+            found[quotes % 2] = point + newline + 1
+        position = newline + 1
+    return found
+
+
+def scan_split_point(file_path, start, end):
+    return count_quotes(file_path, start, end), record_starts_after(file_path, start)
+
+
+def plan_ranges(executor, file_path, parts):
+    """Return up to `parts` line-aligned (start, end) byte ranges covering the rows after the header, or None when
+    a split point cannot be moved out of a quoted field."""
+    size = os.path.getsize(file_path)
+    points = [size * part // parts for part in range(parts)]
+    scans = list(executor.map(scan_split_point, [file_path] * parts, points, points[1:] + [size]))
+    starts, parity = [], 0
+    for point, (quotes, record_starts) in zip(points, scans):
+        # A newline ends a record when the quotes before it since the start of the file are balanced.
+        start = record_starts[parity % 2]
+        if start is None:
+            if point + SPLIT_SEARCH_BYTES < size:
+                return None
+            start = size
+        starts.append(start)
+        parity += quotes
+    return [(start, end) for start, end in zip(starts, starts[1:] + [size]) if end > start]
+
+
+def merges_exactly(chunk, agg_func, agg_col):
+    return agg_func in EXACT_MERGE_FUNCS or pd.api.types.is_integer_dtype(chunk[agg_col])
+
+
+def aggregate_range(file_path, start, end, columns, filters, group_cols, agg_func, agg_col, exact, chunksize,
+                    usecols, dtype):
+    """Read, filter and aggregate one byte range, in chunks.
+
+    Returns the rows read, the dtype names each column took, the bounds of an integer aggregated column and the
+    merged partial aggregates. With `exact`, reading stops at the first chunk whose partial aggregates would
+    not merge exactly, and the result is marked `inexact`.
+    """
+    predicates = compile_filters(filters)
+    result = {"rows": 0, "dtypes": {}, "bounds": None, "partial": None, "inexact": False}
+    for chunk in read_csv_range(file_path, start, end, columns, chunksize, usecols, dtype):
+        if exact and not merges_exactly(chunk, agg_func, agg_col):
+            result["inexact"] = True
+            return result
+        result["rows"] += len(chunk)
+        for col in chunk.columns:
+            result["dtypes"].setdefault(col, set()).add(chunk[col].dtype.name)
+        if agg_col in chunk.columns and pd.api.types.is_integer_dtype(chunk[agg_col]) and len(chunk):
+            low, high = chunk[agg_col].min(), chunk[agg_col].max()
+            bounds = result["bounds"]
+            result["bounds"] = (low, high) if bounds is None else (min(bounds[0], low), max(bounds[1], high))
+
+        partial = partial_aggregate(apply_compiled_filters(chunk, predicates), group_cols, agg_func, agg_col)
+        result["partial"] = partial if result["partial"] is None else merge_partials([result["partial"], partial],
+                                                                                     agg_func)
+    return result
+
+
+def restore_integer_dtype(grouped, agg_col, results):
+    """Give an integer result the dtype `downcast_integers` gives the whole column, from the bounds of every range,
+    when all its values fit; pandas groupby keeps a small integer dtype on the same condition."""
+    bounds = [result["bounds"] for result in results if result["bounds"] is not None]
+    low, high = min(low for low, _ in bounds), max(high for _, high in bounds)
+    target = pd.to_numeric(pd.Series([low, high]), downcast="integer").dtype
+    values = grouped[agg_col]
+    if np.iinfo(target).min <= values.min() and values.max() <= np.iinfo(target).max:
+        grouped[agg_col] = values.astype(target)
+    return grouped
+
+
+def preprocess_data_parallel(file_path, filters, group_cols, agg_func, agg_col, workers, exact=True,
+                             chunksize=DEFAULT_CHUNKSIZE, usecols=None, dtype=None):
+    """Filter and group a CSV in `workers` processes, each handling one byte range of the file.
+
+    With `exact`, the result is the frame `preprocess_data` builds from the whole file, and float sums and means
+    are not parsed in parallel; without it, they are merged from per-range partial sums like the streaming path
+    does. Returns None when the file is too small to split, cannot be split safely, its ranges disagree on
+    column types or, with `exact`, it aggregates floats inexactly; the caller then reads it in one pass.
+    """
+    if not supports_streaming(agg_func):
+        raise ValueError(f"Aggregation '{agg_func}' cannot be merged across byte ranges.")
+
+    columns = pd.read_csv(file_path, nrows=0).columns
+    validate_columns(columns, filters, group_cols)
+    if agg_func != "count" and agg_col not in columns:
+        raise ValueError(f"Aggregation column '{agg_col}' not found in data.")
+
+    parts = min(workers, os.path.getsize(file_path) // (MIN_RANGE_MB * 1024 * 1024))
+    if parts < 2:
+        return None
+    if exact and agg_func != "count" and not merges_exactly(
+            pd.read_csv(file_path, usecols=[agg_col], nrows=FLOAT_SAMPLE_ROWS), agg_func, agg_col):
+        logger.info(f"Float {agg_func} of {agg_col} does not merge exactly across byte ranges; "
+                    f"parsing {file_path} in one process.")
+        return None
+    with ProcessPoolExecutor(max_workers=parts) as executor:
+        ranges = plan_ranges(executor, file_path, parts)
+        if ranges is None:
+            logger.info(f"{file_path} may have a quoted newline at a split point; parsing it in one process.")
+            return None
+        try:
+            results = list(executor.map(aggregate_range, *zip(*[
+                (file_path, start, end, columns, filters, group_cols, agg_func, agg_col, exact, chunksize, usecols,
+                 dtype) for start, end in ranges])))
+        except Exception as e:
+            logger.warning(f"Parallel parsing of {file_path} failed ({e}); parsing it in one process.")
+            return None
+
+    if any(result["inexact"] for result in results):
+        logger.info(f"Float {agg_func} of {agg_col} does not merge exactly across byte ranges; "
+                    f"parsing {file_path} in one process.")
+        return None
+    dtypes = {}
+    for result in results:
+        for col, names in result["dtypes"].items():
+            dtypes.setdefault(col, set()).update(names)
+    mixed = sorted(col for col, names in dtypes.items() if len(names) > 1)
+    if mixed:
+        logger.info(f"Byte ranges of {file_path} inferred different types for {mixed}; parsing it in one process.")
+        return None
+    logger.info(f"Parsed {sum(result['rows'] for result in results)} rows of {file_path} in {parts} processes.")
+
+    partials = [result["partial"] for result in results if result["partial"] is not None]
+    grouped = finalize_partial(merge_partials(partials, agg_func), agg_func, agg_col) if partials else None
+    # Empty results keep the dtypes of the single-process path only if they come from it.
+    if grouped is None or grouped.empty:
+        return None
+    if agg_func in ("sum", "min", "max") and pd.api.types.is_integer_dtype(grouped[agg_col]):
+        return restore_integer_dtype(grouped, agg_col, results)
+    return grouped
@@ -0,0 +1,97 @@
+"""Polars aggregation backend: a lazy, multi-threaded query with projection and filter pushdown."""
+from contextlib import nullcontext
+import polars as pl
+from dataProcessing import DTYPE_SAMPLE_ROWS
+
+AGGREGATIONS = {"sum", "mean", "min", "max", "median", "std", "var", "nunique"}
+
+# A value that does not parse as its column's sampled type fails the query instead of being coerced.
+TYPE_INFERENCE_ERRORS = (pl.exceptions.ComputeError,)
+
+
+def session(options):
+    return nullcontext(options)
+
+
+def load(session, file_path, file_format, columns, infer_all_rows=False):
+    if file_format == "csv":
+        data = pl.scan_csv(file_path, infer_schema_length=None if infer_all_rows else DTYPE_SAMPLE_ROWS)
+    elif file_format == "parquet":
+        data = pl.scan_parquet(file_path)
+    else:
+        data = pl.scan_ipc(file_path)
+    return data.select(columns)
+
+
+def predicate_expr(column, operator, value):
+    """Translate one predicate, keeping pandas semantics for missing values.
+
+    Regex patterns are run by the Rust regex engine, which has no lookarounds or backreferences and rejects
+    such patterns.
+    """
+    col = pl.col(column)
+    if operator == "eq":
+        return col == value
+    if operator == "ne":
+        return (col != value) | col.is_null()
+    if operator == "in":
+        return col.is_in(list(value))
+    if operator == "not_in":
+        return ~col.is_in(list(value)) | col.is_null()
+    if operator == "gt":
+        return col > value
+    if operator == "ge":
+        return col >= value
+    if operator == "lt":
+        return col < value
+    if operator == "le":
+        return col <= value
+    if operator == "between":
+        return col.is_between(value[0], value[1])
+    if operator == "regex":
+        return col.cast(pl.String).str.contains(value.pattern)
+    return col.is_null() if value else col.is_not_null()
+
+
+def filter_rows(data, predicates):
+    if not predicates:
+        return data
+    return data.filter(*(predicate_expr(*predicate) for predicate in predicates))
+
+
+def aggregate_expr(agg_func, agg_col):
+    col = pl.col(agg_col)
+    if agg_func == "nunique":
+        return col.drop_nulls().n_unique().cast(pl.Int64)
+    return getattr(col, agg_func)()
+
+
+def group(data, group_cols, agg_func, agg_col):
+    data = data.drop_nulls(group_cols)
+    if agg_func == "count":
+        return data.group_by(group_cols).agg(pl.len().cast(pl.Int64).alias("Count"))
+    return data.group_by(group_cols).agg(aggregate_expr(agg_func, agg_col))
+
+
+def sort(data, columns):
+    return data.sort(columns)
+
+
+def collect(session, data):
+    return data.collect(engine=session.get("engine", "auto"))
+
+
+def rollup(session, grouped, subtotal_cols, agg_col):
+    """Sum the finest subtotal level from the grouped rows and each coarser level from the level below."""
+    levels = {len(subtotal_cols): grouped.group_by(subtotal_cols).agg(pl.col(agg_col).sum())}
+    for level in range(len(subtotal_cols) - 1, 0, -1):
+        levels[level] = levels[level + 1].group_by(subtotal_cols[:level]).agg(pl.col(agg_col).sum())
+    return levels
+
+
+def to_pandas(data):
+    df = data.to_pandas()
+    for name, dtype in data.schema.items():
+        if dtype == pl.String:
+            df[name] = df[name].astype("str")
+    return df
@@ -0,0 +1,101 @@
+"""The pivot as the output files show it, built once per report and handed to every renderer."""
+from dataclasses import dataclass
+from typing import Any, List, Optional
+import numpy as np
+import pandas as pd
+from tableDataProcessing import (SUBTOTAL_LEVEL_COL, blank_repeated_labels, cell_matrix, cells_to_rows,
+                                 get_subtotal_levels)
+from utils.profiling import span
+
+# Level given to data rows when comparing levels, so that no column's merge rule ever stops at them.
+DATA_ROW_LEVEL = np.iinfo(np.int64).max
+
+
+def pivot_columns(group_cols, agg_col):
+    """The columns every output shows: the group labels, then the aggregated value."""
+    return group_cols + [agg_col]
+
+
+@dataclass
+class RenderedPivot:
+    """Cell values with repeated group labels blanked, plus what the renderers need to style them.
+
+    `levels` holds each row's subtotal level (0 for the grand total, None for data rows), `column_types` is
+    "number" or "text" per column, and `merge_runs` is an integer array of (column, first_row, last_row)
+    runs of blank label cells shown as one merged cell, with 0-based indices into `rows`.
+    """
+    header: List[str]
+    rows: List[List[Any]]
+    levels: List[Optional[int]]
+    column_types: List[str]
+    dynamic_cols: List[str]
+    merge_runs: np.ndarray
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def table_data(self):
+        """The header followed by the rows, as reportlab tables take them."""
+        return [self.header] + self.rows
+
+    def slice(self, start, end):
+        """Return rows `start` to `end` (exclusive) as a pivot of their own, with the merge runs clipped."""
+        runs = self.merge_runs[(self.merge_runs[:, 1] < end) & (self.merge_runs[:, 2] >= start)]
+        runs = np.column_stack((runs[:, 0], np.maximum(runs[:, 1], start) - start,
+                                np.minimum(runs[:, 2], end - 1) - start))
+        return RenderedPivot(self.header, self.rows[start:end], self.levels[start:end], self.column_types,
+                             self.dynamic_cols, runs[runs[:, 2] > runs[:, 1]])
+
+    def record_columns(self):
+        """Return the cells column by column, as records that can be read one row at a time.
+
+        Labels blanked because they repeat the row above are filled back in (a subtotal row of level n only
+        has n labels), and blank numbers become None.
+        """
+        cells = np.array(self.rows, dtype=object).reshape(len(self.rows), len(self.header))
+        row_levels = np.array([DATA_ROW_LEVEL if level is None else level for level in self.levels], dtype=np.int64)
+        columns = []
+        for col in range(len(self.header)):
+            values = cells[:, col]
+            if col < len(self.header) - 1:
+                repeated = (values == "") & (row_levels > col)
+                values = values[np.maximum.accumulate(np.where(repeated, 0, np.arange(len(values))))]
+            elif self.column_types[col] == "number":
+                values = np.where(values == "", None, values)
+            columns.append(values)
+        return columns
+
+
+def column_type(dtype):
+    return "number" if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) else "text"
+
+
+def plan_merge_runs(cells, row_levels, num_label_cols):
+    """Return the runs of blank cells to merge in each label column.
+
+    In the n-th column a run of blank cells continues until a non-blank cell or a row of subtotal level n or
+    lower (the grand total included) breaks it. Each column is one run-length pass over a boolean mask.
+    """
+    runs = []
+    for col in range(num_label_cols):
+        mergeable = (cells[:, col] == "") & (row_levels > col + 1)
+        edges = np.diff(np.concatenate(([0], mergeable.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+        longer = ends > starts
+        runs.append(np.column_stack((np.full(longer.sum(), col), starts[longer], ends[longer])))
+    return np.concatenate(runs).astype(np.int64) if runs else np.empty((0, 3), dtype=np.int64)
+
+
+def render_pivot(final_data, dynamic_cols):
+    """Build the rendered pivot of `final_data` in one vectorized pass over its columns."""
+    with span("table", rows_in=len(final_data)) as table_span:
+        header = [col for col in final_data.columns if col != SUBTOTAL_LEVEL_COL]
+        cells = cell_matrix(final_data, header)
+        blank_repeated_labels(cells, [header.index(col) for col in dynamic_cols[:-1]])
+        row_levels = final_data[SUBTOTAL_LEVEL_COL].fillna(DATA_ROW_LEVEL).to_numpy(dtype=np.int64)
+        pivot = RenderedPivot(header=header, rows=cells_to_rows(cells), levels=get_subtotal_levels(final_data),
+                              column_types=[column_type(final_data[col].dtype) for col in header],
+                              dynamic_cols=dynamic_cols, merge_runs=plan_merge_runs(cells, row_levels, len(header) - 1))
+        table_span.rows_out = len(pivot)
+    return pivot
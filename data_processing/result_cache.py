@@ -0,0 +1,193 @@
+"""On-disk cache of computed pivots, keyed by the content of the input file and the data config.
+
+The cache is off unless a config sets `"cache": {"enabled": true}`. Entries are pickles, and unpickling a file
+planted by someone else runs their code, so the cache directory must belong to the current user and be
+writable by nobody else; entries owned by another user are ignored.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pivot_tables")
+DEFAULT_MAX_SIZE_MB = 512
+HASH_BLOCK_SIZE = 1024 * 1024
+FINGERPRINTS_DIR = "fingerprints"
+RESULT_EXTENSION = ".pkl"
+
+# Data settings that do not change the result. The chunk size, thresholds and worker count stay in the key: they
+# pick between aggregation paths whose float sums, merged from different partial sums, can differ in the last bits.
+NON_RESULT_KEYS = {"csv_file_path", "incremental", "incremental_state_dir"}
+
+
+def cache_settings(cache_config: Optional[Dict]):
+    """Return (directory, max size in bytes) for an enabled cache config, or None if caching is off."""
+    cache_config = cache_config or {}
+    if not cache_config.get("enabled", False):
+        return None
+    directory = os.path.expanduser(cache_config.get("directory", DEFAULT_CACHE_DIR))
+    return directory, int(cache_config.get("max_size_mb", DEFAULT_MAX_SIZE_MB) * 1024 * 1024)
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_owned(stat) -> bool:
+    return not hasattr(os, "getuid") or stat.st_uid == os.getuid()
+
+
+def prepare_cache_dir(cache_dir: str) -> None:
+    """Create the cache directory private to the current user, or raise OSError for one others could write to."""
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    os.makedirs(os.path.join(cache_dir, FINGERPRINTS_DIR), mode=0o700, exist_ok=True)
+    for directory in (cache_dir, os.path.join(cache_dir, FINGERPRINTS_DIR)):
+        stat = os.stat(directory)
+        if not is_owned(stat):
+            raise OSError(f"{directory} belongs to another user")
+        if stat.st_mode & 0o022:
+            raise OSError(f"{directory} is writable by other users")
+
+
+def fingerprint_path(abs_path: str, cache_dir: str) -> str:
+    name = hashlib.blake2b(abs_path.encode(), digest_size=20).hexdigest()
+    return os.path.join(cache_dir, FINGERPRINTS_DIR, name + ".json")
+
+
+def read_fingerprint(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_atomically(path: str, write) -> None:
+    """Write through a temporary file so concurrent readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def file_fingerprint(file_path: str, cache_dir: str) -> str:
+    """Return the content hash of a file, re-hashing only when its size, mtime or inode changed.
+
+    Each input file has a fingerprint file of its own, replaced whole, so processes fingerprinting different
+    files in parallel never overwrite each other's entries.
+    """
+    stat = os.stat(file_path)
+    signature = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    abs_path = os.path.abspath(file_path)
+    path = fingerprint_path(abs_path, cache_dir)
+    known = read_fingerprint(path)
+    if known and known.get("file") == abs_path and known["signature"] == signature:
+        return known["hash"]
+
+    fingerprint = {"file": abs_path, "signature": signature, "hash": hash_file(file_path)}
+
+    def write(tmp_path):
+        with open(tmp_path, "w") as file:
+            json.dump(fingerprint, file)
+
+    write_atomically(path, write)
+    return fingerprint["hash"]
+
+
+def cache_key(csv_path: str, data_config: Dict, cache_dir: str) -> str:
+    """Key a pivot by the CSV content and the canonicalized data config that produced it."""
+    canonical = {k: v for k, v in data_config.items() if k not in NON_RESULT_KEYS}
+    payload = json.dumps({"version": CACHE_VERSION, "file": file_fingerprint(csv_path, cache_dir), "data": canonical},
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+def load_cached_result(key: str, cache_dir: str) -> Optional[pd.DataFrame]:
+    path = os.path.join(cache_dir, key + RESULT_EXTENSION)
+    try:
+        if not is_owned(os.stat(path)):
+            logger.warning(f"Ignoring cache entry {path}, which belongs to another user.")
+            return None
+        result = pd.read_pickle(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+    # Touch the entry so eviction drops the least recently used results first.
+    os.utime(path)
+    return result
+
+
+def evict_entries(cache_dir: str, max_size: int) -> None:
+    """Delete the least recently used results until the cache fits in max_size bytes."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(RESULT_EXTENSION):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def store_result(key: str, result: pd.DataFrame, cache_dir: str, max_size: int) -> None:
+    write_atomically(os.path.join(cache_dir, key + RESULT_EXTENSION), result.to_pickle)
+    evict_entries(cache_dir, max_size)
+
+
+def cached_result(csv_path: str, data_config: Dict, cache_config: Optional[Dict], compute):
+    """Return the pivot for this CSV and data config from the cache, computing and storing it on a miss.
+
+    `compute` is called with no arguments and may return None (no data), which is never cached.
+    """
+    settings = cache_settings(cache_config)
+    if settings is None:
+        return compute()
+    cache_dir, max_size = settings
+
+    try:
+        prepare_cache_dir(cache_dir)
+        key = cache_key(csv_path, data_config, cache_dir)
+    except OSError as e:
+        logger.warning(f"Result cache unavailable: {e}")
+        return compute()
+
+    result = load_cached_result(key, cache_dir)
+    if result is not None:
+        logger.info(f"Loaded pivot for {csv_path} from the result cache.")
+        return result
+
+    result = compute()
+    if result is not None:
+        try:
+            store_result(key, result, cache_dir, max_size)
+        except OSError as e:
+            logger.warning(f"Could not store the pivot in the result cache: {e}")
+    return result
+
+
+def is_cached(csv_path: str, data_config: Dict, cache_config: Optional[Dict]) -> bool:
+    settings = cache_settings(cache_config)
+    if settings is None or not os.path.isdir(settings[0]):
+        return False
+    try:
+        key = cache_key(csv_path, data_config, settings[0])
+    except OSError:
+        return False
+    return os.path.exists(os.path.join(settings[0], key + RESULT_EXTENSION))
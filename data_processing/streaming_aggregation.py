@@ -0,0 +1,105 @@
+import io
+import pandas as pd
+
+from dataProcessing import decategorize, validate_columns
+from filter_engine import apply_compiled_filters, compile_filters
+
+DEFAULT_CHUNKSIZE = 500_000
+
+# Statistics kept per group for each aggregation function. Every statistic can be
+# merged across chunks, so memory only grows with the number of groups.
+PARTIAL_STATS = {
+    "count": ["count"],
+    "sum": ["sum"],
+    "min": ["min"],
+    "max": ["max"],
+    "mean": ["sum", "count"],
+}
+
+MERGE_FUNCS = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+class ByteRange(io.RawIOBase):
+    """Read-only view of the bytes [start, end) of an open binary file."""
+
+    def __init__(self, file, start, end):
+        file.seek(start)
+        self.file, self.remaining = file, max(end - start, 0)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.file.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def read_csv_range(file_path, start, end, names, chunksize=DEFAULT_CHUNKSIZE, usecols=None, dtype=None):
+    """Yield the rows stored between two line-aligned byte offsets of a CSV, in chunks of `chunksize` rows."""
+    if end <= start:
+        return
+    with open(file_path, "rb") as file:
+        reader = io.BufferedReader(ByteRange(file, start, end))
+        yield from pd.read_csv(reader, header=None, names=names, chunksize=chunksize, usecols=usecols, dtype=dtype)
+
+
+def supports_streaming(agg_func):
+    """Return True if the aggregation can be computed from merged partial aggregates."""
+    return agg_func in PARTIAL_STATS
+
+
+def partial_aggregate(df, group_cols, agg_func, agg_col):
+    """Aggregate one chunk into mergeable per-group statistics indexed by the group columns."""
+    if agg_func == "count":
+        partial = df.groupby(group_cols, observed=True).size().to_frame("count")
+    else:
+        partial = df.groupby(group_cols, observed=True)[agg_col].agg(PARTIAL_STATS[agg_func])
+    # Chunks carry their own categories, so keys are stored as plain values before merging.
+    return decategorize(partial.reset_index()).set_index(group_cols)
+
+
+def merge_partials(partials, agg_func):
+    """Merge partial aggregates that share the same group columns."""
+    combined = pd.concat(partials)
+    stats = PARTIAL_STATS[agg_func]
+    return combined.groupby(level=list(range(combined.index.nlevels))).agg({s: MERGE_FUNCS[s] for s in stats})
+
+
+def finalize_partial(partial, agg_func, agg_col):
+    """Turn merged partial aggregates into the frame `group_data` would have produced."""
+    if agg_func == "count":
+        return partial["count"].rename("Count").reset_index()
+    if agg_func == "mean":
+        return (partial["sum"] / partial["count"]).rename(agg_col).reset_index()
+    return partial[agg_func].rename(agg_col).reset_index()
+
+
+def preprocess_data_streaming(file_path, filters, group_cols, agg_func, agg_col, chunksize=DEFAULT_CHUNKSIZE,
+                              usecols=None, dtype=None):
+    """Filter and group a CSV chunk by chunk, keeping only the per-group aggregates in memory.
+
+    Returns None when the file could not be read or holds no rows, mirroring an empty `load_data` result.
+    """
+    if not supports_streaming(agg_func):
+        raise ValueError(f"Aggregation '{agg_func}' is not supported in streaming mode.")
+
+    columns = pd.read_csv(file_path, nrows=0).columns
+    validate_columns(columns, filters, group_cols)
+    if agg_func != "count" and agg_col not in columns:
+        raise ValueError(f"Aggregation column '{agg_col}' not found in data.")
+    predicates = compile_filters(filters)
+
+    merged = None
+    try:
+        for chunk in pd.read_csv(file_path, chunksize=chunksize, usecols=usecols, dtype=dtype):
+            partial = partial_aggregate(apply_compiled_filters(chunk, predicates), group_cols, agg_func, agg_col)
+            merged = partial if merged is None else merge_partials([merged, partial], agg_func)
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return None
+
+    if merged is None:
+        return None
+    return finalize_partial(merged, agg_func, agg_col)
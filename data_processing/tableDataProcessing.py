@@ -1,43 +1,54 @@
-def preprocess_dataframe(df):
-    """Prepare the dataframe by copying and filling NaN values."""
-    df = df.copy()
-    df.fillna("", inplace=True)
-    return df
+import gc
+import numpy as np
+
+SUBTOTAL_LEVEL_COL = 'Subtotal_Level'
+
+
+def get_subtotal_levels(df):
+    """Return the level of every row from the rollup level column: 0 for grand totals, None for data rows."""
+    levels = df[SUBTOTAL_LEVEL_COL]
+    missing = levels.isna().to_numpy()
+    values = levels.fillna(0).to_numpy(dtype=np.int64).astype(object)
+    values[missing] = None
+    return values.tolist()
+
+
+def cell_matrix(df, columns):
+    """Gather `columns` into one object array, column by column, with missing values as empty strings."""
+    cells = np.empty((len(df), len(columns)), dtype=object)
+    for idx, col in enumerate(columns):
+        cells[:, idx] = df[col].to_numpy(dtype=object)
+        cells[df[col].isna().to_numpy(), idx] = ""
+    return cells
+
+
+def blank_repeated_labels(cells, label_indices):
+    """Blank each label equal to the one above it, as long as every label to its left was left unchanged.
+
+    `unchanged` tracks, row by row, whether all the (already blanked) labels to the left match the row above,
+    so each label column is compared once with its neighbour.
+    """
+    unchanged = np.ones(len(cells), dtype=bool)
+    unchanged[:1] = False
+    for idx in label_indices:
+        column = cells[:, idx]
+        repeated = unchanged.copy()
+        repeated[1:] &= column[1:] == column[:-1]
+        column[repeated] = ""
+        unchanged[1:] &= column[1:] == column[:-1]
+
+
+def cells_to_rows(cells):
+    """Convert the cell array to lists with the cyclic garbage collector paused.
+
+    The rows only hold scalars, so they cannot form cycles, yet allocating one list per row would otherwise
+    trigger repeated collections that cost several times the conversion itself.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return cells.tolist()
+    finally:
+        if enabled:
+            gc.enable()
 
-
-def assign_subtotal_levels(df, dynamic_cols):
-    """Assign levels to subtotals and grand totals in the dataframe."""
-    df['Subtotal_Level'] = None
-    assign_subtotal_for_dynamic_cols(df, dynamic_cols)
-    mark_grand_totals(df, dynamic_cols)
-
-
-def assign_subtotal_for_dynamic_cols(df, dynamic_cols):
-    """Assign subtotal levels based on dynamic columns."""
-    for idx, (current_col, next_col) in enumerate(zip(dynamic_cols[:-1], dynamic_cols[1:])):
-        is_subtotal = df[current_col].eq("") & df[next_col].ne("")
-        df.loc[is_subtotal, 'Subtotal_Level'] = idx + 1
-
-
-def mark_grand_totals(df, dynamic_cols):
-    """Mark the grand total rows specifically."""
-    df.loc[df[dynamic_cols[-1]] == "Grand Total", 'Subtotal_Level'] = 0
-    subtotal_and_total_rows = df[dynamic_cols[-1]].isin(["", "Grand Total"])
-    df.loc[subtotal_and_total_rows, dynamic_cols[:-1]] = ""
-
-
-def clean_up_columns(df, dynamic_cols):
-    """Clean up the columns to ensure proper formatting for the table."""
-    for idx, col in enumerate(dynamic_cols[:-1]):
-        df[col] = df[col].where(~(
-                df[col].eq(df[col].shift()) &
-                df[dynamic_cols[:idx]].eq(df[dynamic_cols[:idx]].shift(1)).all(axis=1)
-        ), "")
-
-
-def format_table_data(df):
-    """Format the dataframe into a list of lists for table data."""
-    table_data = [df.columns.tolist()] + df.values.tolist()
-    for row in table_data:
-        del row[-1]
-    return table_data
@@ -1,6 +1,16 @@
+"""Command-line entry point.
+
+Only the config handling and the output format registry are imported up front. pandas, the aggregation
+backends and the renderers are imported by the command that needs them, so `--check-config`, `--help` and
+text-only runs start without loading reportlab, openpyxl or, for `--check-config`, pandas.
+"""
 import argparse
-from config.config_handling import read_config, get_interactive_config
-from data_processing.data_processing_controller import process_data_and_generate_files
+import time
+from typing import Dict, List
+from config.config_handling import read_config, get_interactive_config, read_batch_config
+from data_processing.file_formats import COLUMNAR_FORMATS
+from output_generation.outputFormats import OUTPUT_FORMATS
+from utils.profiling import disable_profiling, enable_profiling, log_profile_summary, write_trace
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(module)s:%(message)s')
@@ -8,16 +18,147 @@ logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(module)s:%(messa
 DEFAULT_CONFIG_FILE = 'config/config.json'
 
 
-def main(args: argparse.Namespace) -> None:
+def convert(args: argparse.Namespace) -> None:
+    from data_processing.input_formats import convert_csv
+    start = time.perf_counter()
+    rows = convert_csv(args.source, args.destination, args.format)
+    logging.info(f"Converted {rows} rows from {args.source} to {args.destination} "
+                 f"in {time.perf_counter() - start:.2f}s.")
+
+
+def check_backends(config: Dict) -> bool:
+    """Check that every aggregation backend builds the same pivot as the default pandas path."""
+    from data_processing.aggregation_backends import PANDAS_BACKEND, compare_backends
+    from data_processing.data_processing_controller import build_final_data
+    data_config = dict(config['data'], backend=PANDAS_BACKEND)
+    reference = build_final_data(data_config['csv_file_path'], data_config)
+    results = compare_backends(data_config['csv_file_path'], data_config, reference)
+    for backend, difference in results.items():
+        if difference is None:
+            logging.info(f"The {backend} backend matches the default pandas path.")
+        else:
+            logging.error(f"The {backend} backend differs from the default pandas path: {difference}")
+    return all(difference is None for difference in results.values())
+
+
+def check_configs(configs: List[Dict], formats) -> bool:
+    """Validate each config against its input file's header, logging every problem found."""
+    from data_processing.config_check import config_problems
+    start = time.perf_counter()
+    valid = True
+    for config in configs:
+        name = config.get('name', config.get('data', {}).get('csv_file_path', "config"))
+        problems = config_problems(config, formats)
+        for problem in problems:
+            logging.error(f"{name}: {problem}")
+        valid = valid and not problems
+    if valid:
+        logging.info(f"Config OK ({len(configs)} report(s) checked in {time.perf_counter() - start:.3f}s).")
+    return valid
+
+
+def run_reports(args: argparse.Namespace, jobs: int) -> None:
+    from data_processing.batch_processing import run_batch
+    from data_processing.data_processing_controller import process_data_and_generate_files
+    if args.batch:
+        run_batch(read_batch_config(args.batch), jobs=jobs, use_cache=not args.no_cache, formats=args.formats,
+                  workbook=args.workbook)
+        return
+
+    if args.workbook:
+        logging.warning("--workbook only applies to --batch runs; writing one Excel file per report.")
     config_file = args.config_file or DEFAULT_CONFIG_FILE
     config = read_config(config_file) if not args.interactive else {'data': get_interactive_config(),
                                                                     'styles': read_config(config_file).get('styles',
                                                                                                            {})}
-    process_data_and_generate_files(config)
+    process_data_and_generate_files(config, jobs=jobs, use_cache=not args.no_cache, formats=args.formats)
+
+
+def run_profiled(args: argparse.Namespace) -> None:
+    """Run the reports with profiling spans enabled, then print the per-stage summary."""
+    if args.jobs > 1:
+        logging.warning("Profiling runs every stage in this process; ignoring --jobs.")
+    enable_profiling(trace_memory=not args.profile_no_memory, cprofile_dir=args.profile_dir)
+    try:
+        run_reports(args, jobs=1)
+    finally:
+        records = disable_profiling()
+        log_profile_summary(records)
+        if args.profile_trace:
+            write_trace(records, args.profile_trace)
+            logging.info(f"Profile trace written to {args.profile_trace}.")
+        if args.profile_dir:
+            logging.info(f"cProfile dumps written to {args.profile_dir}.")
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.command == 'convert':
+        convert(args)
+        return
+
+    if args.command == 'serve':
+        from server.pivot_server import serve
+        styles = read_config(args.config_file or DEFAULT_CONFIG_FILE).get('styles', {})
+        # Options left unset fall back to the server's own defaults.
+        options = {name: getattr(args, name) for name in ('host', 'port', 'socket_path', 'workers', 'queue_size',
+                                                          'cache_mb') if getattr(args, name) is not None}
+        serve(styles, use_cache=not args.no_cache, **options)
+        return
+
+    if args.check_config:
+        config_file = args.config_file or DEFAULT_CONFIG_FILE
+        configs = read_batch_config(args.batch) if args.batch else [read_config(config_file)]
+        if not check_configs(configs, args.formats):
+            raise SystemExit(1)
+        return
+
+    if args.command == 'check-backends':
+        if not check_backends(read_config(args.config_file or DEFAULT_CONFIG_FILE)):
+            raise SystemExit(1)
+        return
+
+    if args.profile or args.profile_trace or args.profile_dir:
+        run_profiled(args)
+        return
+
+    run_reports(args, jobs=args.jobs)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Build PDF and Excel files.")
     parser.add_argument('--config-file', help="Path to the configuration file")
     parser.add_argument('--interactive', action='store_true', help="Run in interactive mode")
+    parser.add_argument('--batch', help="Path to a JSON list of report configs to run in one invocation")
+    parser.add_argument('--workbook',
+                        help="With --batch, write every report as a sheet of this one Excel file instead")
+    parser.add_argument('--jobs', type=int, default=1, help="Number of processes used to render the output files")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute the pivot even when the config enables the result cache")
+    parser.add_argument('--check-config', action='store_true',
+                        help="Only check the config (or every --batch report) against its input file's header")
+    parser.add_argument('--formats', nargs='+', choices=sorted(OUTPUT_FORMATS),
+                        help="Output formats to write, overriding the config's output.formats (default: pdf excel)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print the time, rows and memory peak of every pipeline stage")
+    parser.add_argument('--profile-trace', help="Also write the profiled stages as a Chrome trace JSON file")
+    parser.add_argument('--profile-dir', help="Also write a cProfile dump of every outermost stage to this directory")
+    parser.add_argument('--profile-no-memory', action='store_true',
+                        help="Skip tracemalloc while profiling, which keeps allocation-heavy stages at full speed")
+    subparsers = parser.add_subparsers(dest='command')
+    convert_parser = subparsers.add_parser('convert', help="Convert a CSV once to a columnar format for faster reads")
+    convert_parser.add_argument('source', help="Path to the CSV file")
+    convert_parser.add_argument('destination', help="Path of the file to write (.parquet, .feather or .arrow)")
+    convert_parser.add_argument('--format', choices=sorted(COLUMNAR_FORMATS),
+                                help="Output format; defaults to the destination extension")
+    subparsers.add_parser('check-backends', help="Check that every aggregation backend builds the same pivot")
+    serve_parser = subparsers.add_parser('serve', help="Serve reports over HTTP, keeping parsed datasets in memory")
+    serve_parser.add_argument('--host', help="Address to listen on")
+    serve_parser.add_argument('--port', type=int, help="TCP port to listen on")
+    serve_parser.add_argument('--socket', dest='socket_path',
+                              help="Listen on this Unix socket path instead of a TCP port")
+    serve_parser.add_argument('--workers', type=int, help="Number of processes rendering output files")
+    serve_parser.add_argument('--queue-size', type=int,
+                              help="Reports that may wait for a worker before new requests are refused with 503")
+    serve_parser.add_argument('--dataset-cache-mb', dest='cache_mb', type=float,
+                              help="Memory bound of the parsed datasets kept between requests")
     main(parser.parse_args())
@@ -1,28 +1,40 @@
-import pandas as pd
+from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment, Border, Side
 import logging
 
 from excelStyles import apply_excel_colors, merge_empty_cells
-from output_generation.pdf.tableStyling import create_table_data
+from excelStreamingWriter import WorkbookWriter, save_excel_streaming
+from utils.profiling import span
 
 logging.basicConfig(level=logging.DEBUG)
 
+STREAMING_WRITER_THRESHOLD_ROWS = 10_000
 
-def save_excel(data, file_path, dynamic_cols, config):
-    if data.empty:
+
+def save_excel(pivot, file_path, config):
+    if not len(pivot):
         logging.warning("No data to display in the Excel file.")
         return
 
     try:
-        table_data = create_table_data(data, dynamic_cols)
-        df = pd.DataFrame(table_data[1:], columns=table_data[0])
-
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Report', index=False)
-            worksheet = writer.sheets['Report']
-
-            apply_styles_excel(worksheet, config, df)
+        if use_streaming_writer(config, len(pivot) + 1):
+            with span("excel_write", rows_in=len(pivot)):
+                save_excel_streaming(pivot, file_path, config)
+            logging.info("Excel generation completed successfully.")
+            return
+
+        with span("excel_write", rows_in=len(pivot)):
+            workbook = Workbook()
+            worksheet = workbook.active
+            worksheet.title = 'Report'
+            worksheet.append(pivot.header)
+            for row in pivot.rows:
+                worksheet.append(row)
+
+            with span("excel_styling", rows_in=len(pivot)):
+                apply_styles_excel(worksheet, config, pivot)
+            workbook.save(file_path)
 
         logging.info("Excel generation completed successfully.")
 
@@ -30,13 +42,50 @@ def save_excel(data, file_path, dynamic_cols, config):
         logging.error(f"Error building Excel: {e}")
 
 
-def apply_styles_excel(worksheet, config, df):
+def open_excel_workbook():
+    """Start a workbook whose sheets are added one report at a time by `add_excel_sheet`."""
+    return WorkbookWriter()
+
+
+def add_excel_sheet(workbook, name, pivot, config):
+    if not len(pivot):
+        logging.warning(f"No data to display in the {name} sheet.")
+        return
+
+    try:
+        with span("excel_write", rows_in=len(pivot)):
+            workbook.add(name, pivot, config)
+    except Exception as e:
+        logging.error(f"Error adding {name} to the Excel workbook: {e}")
+
+
+def save_excel_workbook(workbook, file_path):
+    if not workbook.sheets:
+        logging.warning("No data to display in the Excel workbook.")
+        return
+
+    try:
+        workbook.save(file_path)
+        logging.info(f"Excel workbook with {workbook.sheets} sheets completed successfully.")
+
+    except Exception as e:
+        logging.error(f"Error building Excel workbook: {e}")
+
+
+def use_streaming_writer(config, num_rows):
+    writer = config.get("excel_writer", "auto")
+    if writer == "auto":
+        return num_rows > STREAMING_WRITER_THRESHOLD_ROWS
+    return writer == "streaming"
+
+
+def apply_styles_excel(worksheet, config, pivot):
     set_row_heights(worksheet)
-    set_column_widths(df, worksheet)
-    apply_cell_alignment(df, worksheet, config)
+    set_column_widths(pivot, worksheet)
+    apply_cell_alignment(pivot, worksheet, config)
     apply_cell_borders(worksheet)
-    apply_excel_colors(worksheet, config)
-    merge_empty_cells(worksheet, df)
+    apply_excel_colors(worksheet, config, pivot.levels)
+    merge_empty_cells(worksheet, pivot)
 
 
 def set_row_heights(worksheet):
@@ -49,9 +98,9 @@ def set_row_heights(worksheet):
         worksheet.row_dimensions[row].height = normal_row_height
 
 
-def set_column_widths(df, worksheet):
-    for col_idx, col in enumerate(df.columns, 1):
-        max_length = max((len(str(x)) for x in df[col]), default=10)
+def set_column_widths(pivot, worksheet):
+    for col_idx in range(1, len(pivot.header) + 1):
+        max_length = max((len(str(row[col_idx - 1])) for row in pivot.rows), default=10)
         adjusted_width = max_length + 5
         worksheet.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
 
@@ -69,8 +118,8 @@ def apply_cell_borders(worksheet):
             cell.border = thin_border
 
 
-def apply_cell_alignment(df, worksheet, config):
-    for col_idx, col in enumerate(df.columns, 1):
+def apply_cell_alignment(pivot, worksheet, config):
+    for col_idx in range(1, len(pivot.header) + 1):
         for row in range(1, worksheet.max_row + 1):
             cell = worksheet.cell(row=row, column=col_idx)
             horizontal_alignment = config['alignment']['header'].lower() if row == 1 else (config['alignment']['global']
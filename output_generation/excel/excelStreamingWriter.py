@@ -0,0 +1,119 @@
+import json
+import re
+from typing import Any, Dict, Set
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, NamedStyle, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+
+from excelStyles import create_fill, create_font, row_style_key
+
+NORMAL_ROW_HEIGHT = 25
+HEADER_ROW_HEIGHT = NORMAL_ROW_HEIGHT + 10
+MAX_SHEET_TITLE = 31
+
+
+def build_named_styles(config: Dict[str, Any], prefix: str = 'pivot') -> Dict[str, NamedStyle]:
+    """Build one named style per colour key, plus unfilled styles for plain and merged cells."""
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_alignment = Alignment(horizontal=config['alignment']['header'].lower(), vertical='center')
+    content_alignment = Alignment(horizontal=config['alignment']['global'].lower(), vertical='center')
+
+    styles = {
+        'plain': NamedStyle(name=f'{prefix}_plain', border=border, alignment=content_alignment),
+        'merged': NamedStyle(name=f'{prefix}_merged', border=border),
+    }
+    for key, value in config['colors'].items():
+        styles[key] = NamedStyle(name=f'{prefix}_{key}', fill=create_fill(value['background']),
+                                 font=create_font(value['text'], key == 'header'), border=border,
+                                 alignment=header_alignment if key == 'header' else content_alignment)
+    return styles
+
+
+def sheet_title(name: str, used: Set[str]) -> str:
+    """Turn a report name into a sheet title Excel accepts: at most 31 characters, none of []:*?/\\, and unique
+    regardless of case."""
+    base = re.sub(r"[\[\]:*?/\\]", "_", str(name)).strip("'")[:MAX_SHEET_TITLE] or "Report"
+    title, suffix = base, 1
+    while title.lower() in used:
+        suffix += 1
+        title = f"{base[:MAX_SHEET_TITLE - len(str(suffix)) - 3]} ({suffix})"
+    used.add(title.lower())
+    return title
+
+
+def styled_cell(worksheet, value: Any, style: NamedStyle) -> WriteOnlyCell:
+    cell = WriteOnlyCell(worksheet, value=None if value == "" else value)
+    cell.style = style.name
+    return cell
+
+
+def write_pivot_sheet(workbook, title: str, pivot, styles: Dict[str, NamedStyle]) -> None:
+    """Append one sheet holding the table, emitting every row once with the given named styles.
+
+    Column widths, row heights and merge ranges (from the subtotal levels) are computed before the first row
+    is written, since a write-only sheet cannot be revisited.
+    """
+    header, rows, levels = pivot.header, pivot.rows, pivot.levels
+    merges = [(first + 2, col + 1, last + 2) for col, first, last in pivot.merge_runs.tolist()]
+    merged_cells = {(row, col) for start_row, col, end_row in merges for row in range(start_row + 1, end_row + 1)}
+
+    worksheet = workbook.create_sheet(title)
+    for col_idx in range(len(header)):
+        max_length = max((len(str(row[col_idx])) for row in rows), default=10)
+        worksheet.column_dimensions[get_column_letter(col_idx + 1)].width = max_length + 5
+    worksheet.sheet_format.defaultRowHeight = NORMAL_ROW_HEIGHT
+    worksheet.sheet_format.customHeight = True
+    worksheet.row_dimensions[1].height = HEADER_ROW_HEIGHT
+    worksheet.merged_cells = MultiCellRange(
+        CellRange(min_col=col, min_row=start_row, max_col=col, max_row=end_row) for start_row, col, end_row in merges)
+
+    worksheet.append([styled_cell(worksheet, value, styles['header']) for value in header])
+    for row_idx, (row, level) in enumerate(zip(rows, levels), start=2):
+        key, start_col = row_style_key(level, styles)
+        worksheet.append([
+            styled_cell(worksheet, None, styles['merged']) if (row_idx, col_idx) in merged_cells else
+            styled_cell(worksheet, value, styles[key] if col_idx >= start_col else styles['plain'])
+            for col_idx, value in enumerate(row, start=1)
+        ])
+
+
+class WorkbookWriter:
+    """Add reports as sheets of one write-only workbook as they arrive, then save it once.
+
+    Each sheet's rows go to a temporary file as they are appended, so only the report being added is held in
+    memory. Reports sharing a styles config share its named styles, so the style table does not grow with the
+    number of sheets.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        self.registered = {}
+        self.used_titles = set()
+        self.sheets = 0
+
+    def named_styles(self, config: Dict[str, Any]) -> Dict[str, NamedStyle]:
+        """Return the named styles of a styles config, adding them to the workbook the first time it is seen."""
+        # Only the alignment and colours end up in the named styles.
+        key = json.dumps([config['alignment'], config['colors']], sort_keys=True)
+        if key not in self.registered:
+            prefix = 'pivot' if not self.registered else f'pivot{len(self.registered) + 1}'
+            self.registered[key] = build_named_styles(config, prefix)
+            for style in self.registered[key].values():
+                self.workbook.add_named_style(style)
+        return self.registered[key]
+
+    def add(self, name: str, pivot, config: Dict[str, Any]) -> None:
+        write_pivot_sheet(self.workbook, sheet_title(name, self.used_titles), pivot, self.named_styles(config))
+        self.sheets += 1
+
+    def save(self, file_path: str) -> None:
+        self.workbook.save(file_path)
+
+
+def save_excel_streaming(pivot, file_path: str, config: Dict[str, Any]) -> None:
+    writer = WorkbookWriter()
+    writer.add('Report', pivot, config)
+    writer.save(file_path)
@@ -0,0 +1,40 @@
+"""Registry of the output formats a report can be rendered to.
+
+Every format maps to a file extension and to a `save(pivot, file_path, config)` function taking the
+`RenderedPivot` of the report and the `styles` config. Renderer modules are imported only when their format
+is used, so a CSV-only run never loads reportlab or openpyxl.
+"""
+import importlib
+from typing import Dict, List, Optional
+
+OUTPUT_FORMATS = {
+    "pdf": ("pdf", "output_generation.pdf.pdfGeneration", "save_pdf"),
+    "excel": ("xlsx", "output_generation.excel.excelGeneration", "save_excel"),
+    "csv": ("csv", "output_generation.text.csvGeneration", "save_csv"),
+    "jsonl": ("jsonl", "output_generation.text.jsonlGeneration", "save_jsonl"),
+    "html": ("html", "output_generation.text.htmlGeneration", "save_html"),
+}
+DEFAULT_FORMATS = ["pdf", "excel"]
+
+
+def register_output_format(name: str, extension: str, module: str, function: str) -> None:
+    """Add or replace a format, rendered by `function` of the importable `module`."""
+    OUTPUT_FORMATS[name] = (extension, module, function)
+
+
+def selected_formats(config: Dict, formats: Optional[List[str]] = None) -> List[str]:
+    """Return the formats given on the command line, else those of the `output` config section."""
+    formats = formats or config.get("output", {}).get("formats", DEFAULT_FORMATS)
+    unknown = [file_type for file_type in formats if file_type not in OUTPUT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown output formats {unknown}; expected some of {sorted(OUTPUT_FORMATS)}.")
+    return list(dict.fromkeys(formats))
+
+
+def output_extension(file_type: str) -> str:
+    return OUTPUT_FORMATS[file_type][0]
+
+
+def get_renderer(file_type: str):
+    _, module, function = OUTPUT_FORMATS[file_type]
+    return getattr(importlib.import_module(module), function)
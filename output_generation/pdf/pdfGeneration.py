@@ -1,28 +1,72 @@
+import dataclasses
 import logging
-from reportlab.platypus import SimpleDocTemplate, Table
-from output_generation.excel.excelStyles import calculate_dynamic_page_size
-from tableStyling import create_table_data, apply_table_styles
+import numpy as np
+from reportlab.lib import units
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table
+from tableStyling import apply_table_styles
+from output_generation.pdf.tableStyleEnhancements import HEADER_BOTTOM_PADDING
+from rendered_pivot import DATA_ROW_LEVEL
+from utils.profiling import span
 
-logging.basicConfig(level=logging.DEBUG)
+CHUNKED_LAYOUT_THRESHOLD_ROWS = 2_000
+# Share of a page, counted back from its last row, searched for a subtotal row to start the next page on.
+GROUP_BREAK_WINDOW = 0.25
+CELL_FONT, HEADER_FONT, FONT_SIZE, CELL_PADDING = "Helvetica", "Helvetica-Bold", 10, 12
+# reportlab's default cell style sets 10pt text on a 12pt leading, with 3pt of padding above and below.
+LEADING, TOP_PADDING, BOTTOM_PADDING = 12, 3, 3
+FRAME_PADDING = 12
 
 
-def save_pdf(data, file_path, dynamic_cols, config):
-    if data.empty:
+def calculate_dynamic_page_size(table_width, table_height, config, paginate, num_rows):
+    default_cell_height = 0.25 * units.inch
+    header_footer_height = 0.55 * units.inch
+
+    margins = config.get("margins", {"top": 1, "bottom": 1, "left": 1, "right": 1})
+
+    estimated_content_height = num_rows * default_cell_height + header_footer_height
+
+    total_width = table_width + (margins["left"] + margins["right"]) * units.inch
+    total_height = estimated_content_height + (margins["top"] + margins["bottom"]) * units.inch
+
+    min_page_size = config.get("min_page_size", letter)
+    max_page_size = config.get("max_page_size", (letter[0] * 2, letter[1] * 2))
+
+    if paginate:
+        return (
+            max(min(total_width, max_page_size[0]), min_page_size[0]),
+            max(min(total_height, max_page_size[1]), min_page_size[1])
+        )
+    else:
+        new_width = max(min(total_width, max_page_size[0]), min_page_size[0])
+        new_height = max(total_height, min_page_size[1])
+        return new_width, new_height
+
+
+def save_pdf(pivot, file_path, config):
+    if not len(pivot):
         logging.warning("No data to display in the PDF.")
         return
 
     paginate = config.get("paginate", True)
 
     try:
-        table_data = create_table_data(data, dynamic_cols)
-        num_rows = len(data)
-        table = Table(table_data)
+        if use_chunked_layout(config, len(pivot) + 1):
+            with span("pdf_write", rows_in=len(pivot)):
+                build_chunked_pdf(file_path, pivot, config)
+            logging.info("PDF generation completed successfully.")
+            return
+
+        num_rows = len(pivot)
+        table = Table(pivot.table_data)
         table_width, table_height = table.wrap(0, 0)
 
         dynamic_page_size = calculate_dynamic_page_size(table_width, table_height, config, paginate, num_rows)
 
-        apply_table_styles(table, table_data, dynamic_cols, config)
-        build_pdf(file_path, table, dynamic_page_size)
+        apply_table_styles(table, pivot, config)
+        with span("pdf_write", rows_in=len(pivot)):
+            build_pdf(file_path, table, dynamic_page_size)
         logging.info("PDF generation completed successfully.")
     except Exception as e:
         logging.error(f"Error building PDF: {e}")
@@ -33,5 +77,88 @@ def build_pdf(file_path, table, page_size):
     doc.build([table])
 
 
-def dynamic_columns_for_pdf(group_cols, agg_col):
-    return group_cols + [agg_col]
+def use_chunked_layout(config, num_rows):
+    layout = config.get("pdf_layout", "auto")
+    if layout == "auto":
+        return num_rows > CHUNKED_LAYOUT_THRESHOLD_ROWS
+    return layout == "chunked"
+
+
+def build_chunked_pdf(file_path, pivot, config):
+    """Lay the table out as one page-sized Table per page, styled chunk by chunk.
+
+    Column widths are measured once over the whole table so every page lines up, and each chunk is small
+    enough to fit its page, so layout cost grows linearly with the number of rows.
+    """
+    col_widths = measure_column_widths(pivot.table_data)
+    page_size = calculate_dynamic_page_size(sum(col_widths), 0, config, True, len(pivot) + 1)
+    doc = SimpleDocTemplate(file_path, pagesize=page_size)
+    rows_per_page = estimate_rows_per_page(pivot, doc.height)
+    labels = None
+
+    flowables = []
+    for start, end in chunk_boundaries(pivot.levels, rows_per_page):
+        chunk = pivot.slice(start, end)
+        if start:
+            labels = labels if labels is not None else pivot.record_columns()
+            chunk = repeat_group_labels(chunk, [column[start] for column in labels])
+        table = Table(chunk.table_data, colWidths=col_widths, repeatRows=1)
+        apply_table_styles(table, chunk, config)
+        flowables.extend([table, PageBreak()])
+    doc.build(flowables[:-1])
+
+
+def measure_column_widths(table_data):
+    """Return the widths reportlab would give each column for its widest cell."""
+    widths = [stringWidth(str(value), HEADER_FONT, FONT_SIZE) for value in table_data[0]]
+    for row in table_data[1:]:
+        widths = [max(width, stringWidth(str(value), CELL_FONT, FONT_SIZE)) for width, value in zip(widths, row)]
+    return [width + CELL_PADDING for width in widths]
+
+
+def row_height(row, bottom_padding=BOTTOM_PADDING):
+    """Return the height reportlab gives a row of plain text cells: one leading per line, plus the padding."""
+    lines = max((str(value).count("\n") + 1 for value in row), default=1)
+    return lines * LEADING + TOP_PADDING + bottom_padding
+
+
+def estimate_rows_per_page(pivot, page_height):
+    """Return how many rows of the tallest kind fit below the header on one page."""
+    header_height = row_height(pivot.header, HEADER_BOTTOM_PADDING)
+    tallest = max((row_height(row) for row in pivot.rows), default=row_height([]))
+    return max(1, int((page_height - FRAME_PADDING - header_height) // tallest))
+
+
+def repeat_group_labels(chunk, labels):
+    """Show on the first row of a continuation page the group labels it leaves blank as repeats of the row above.
+
+    A run of blank cells starting on that row then starts below it, as it does under a group's first row.
+    """
+    first_row = list(chunk.rows[0])
+    level = DATA_ROW_LEVEL if chunk.levels[0] is None else chunk.levels[0]
+    filled = [col for col in range(len(chunk.header) - 1) if first_row[col] == "" and level > col]
+    if not filled:
+        return chunk
+    for col in filled:
+        first_row[col] = labels[col]
+    runs = chunk.merge_runs.copy()
+    runs[(runs[:, 1] == 0) & np.isin(runs[:, 0], filled), 1] = 1
+    return dataclasses.replace(chunk, rows=[first_row] + chunk.rows[1:], merge_runs=runs[runs[:, 2] > runs[:, 1]])
+
+
+def chunk_boundaries(levels, rows_per_page):
+    """Yield (start, end) row ranges of at most `rows_per_page` rows.
+
+    When a subtotal row falls near the end of a page, the page ends just before it so the group it opens
+    starts on the next page; top-level subtotals are preferred over deeper ones.
+    """
+    window = max(1, int(rows_per_page * GROUP_BREAK_WINDOW))
+    start, num_rows = 0, len(levels)
+    while start < num_rows:
+        end = min(start + rows_per_page, num_rows)
+        if end < num_rows:
+            breaks = [row for row in range(max(start + 1, end - window), end + 1) if levels[row]]
+            if breaks:
+                end = min(breaks, key=lambda row: (levels[row], -row))
+        yield start, end
+        start = end
@@ -0,0 +1,83 @@
+from reportlab.lib import colors
+from reportlab.platypus import TableStyle
+from output_generation.pdf.tableStyleEnhancements import base_style_commands, cell_alignment, extract_alignment_settings
+
+LEVEL_COLORS = [colors.lightgrey, colors.lightblue]
+
+
+def compile_table_style(pivot, config):
+    """Compile every style command of the table into one TableStyle.
+
+    Alignment and spans are emitted per run of rows and merged across columns that share the same runs,
+    backgrounds per run of rows with the same colour, so the number of commands follows the number of
+    subtotal groups rather than the number of cells.
+    """
+    return TableStyle(base_style_commands(config)
+                      + alignment_commands(pivot, config)
+                      + background_commands(pivot)
+                      + span_commands(pivot))
+
+
+def row_runs(values):
+    """Return (start, end, value) for each run of equal consecutive values, with inclusive ends."""
+    runs, start = [], 0
+    for index in range(1, len(values) + 1):
+        if index == len(values) or values[index] != values[start]:
+            runs.append((start, index - 1, values[start]))
+            start = index
+    return runs
+
+
+def column_range_commands(name, runs_per_column, first_row):
+    """Emit one command per run, merged across adjacent columns that have identical runs."""
+    commands, col = [], 0
+    while col < len(runs_per_column):
+        last_col = col
+        while last_col + 1 < len(runs_per_column) and runs_per_column[last_col + 1] == runs_per_column[col]:
+            last_col += 1
+        commands.extend((name, (col, start + first_row), (last_col, end + first_row), value)
+                        for start, end, value in runs_per_column[col])
+        col = last_col + 1
+    return commands
+
+
+def alignment_commands(pivot, config):
+    """Align numbers, subtotal labels and text per cell; grand total rows keep the global alignment.
+
+    Cells of numeric columns are numbers unless blank, so only text columns look at each value.
+    """
+    alignment = extract_alignment_settings(config)
+    global_align = config['alignment']['global']
+    last_col = len(pivot.header) - 1
+
+    runs_per_column = []
+    for col in range(last_col + 1):
+        if pivot.column_types[col] == "number":
+            aligned = [alignment['text'] if row[col] == "" else alignment['numbers'] for row in pivot.rows]
+        else:
+            aligned = [cell_alignment(row[col], alignment) for row in pivot.rows]
+        grand_total_align = alignment['numbers'] if col == last_col else global_align
+        column = [grand_total_align if level == 0 else align for align, level in zip(aligned, pivot.levels)]
+        runs_per_column.append(row_runs(column))
+    return column_range_commands("ALIGN", runs_per_column, first_row=1)
+
+
+def background_commands(pivot):
+    """Colour grand total rows and subtotal rows from their first non-empty cell, one command per row run."""
+    row_backgrounds = []
+    for row, level in zip(pivot.rows, pivot.levels):
+        if level == 0:
+            row_backgrounds.append((0, colors.yellow))
+        elif level is not None and level <= len(LEVEL_COLORS):
+            start_col = next((i for i, x in enumerate(row) if x), len(row))
+            row_backgrounds.append((start_col, LEVEL_COLORS[level - 1]))
+        else:
+            row_backgrounds.append(None)
+
+    return [("BACKGROUND", (background[0], start + 1), (-1, end + 1), background[1])
+            for start, end, background in row_runs(row_backgrounds) if background is not None]
+
+
+def span_commands(pivot):
+    """Span each run of blank label cells planned in the pivot; table rows are offset by the header."""
+    return [("SPAN", (col, first + 1), (col, last + 1)) for col, first, last in pivot.merge_runs.tolist()]
@@ -0,0 +1,20 @@
+import csv
+import logging
+from data_processing.tableDataProcessing import SUBTOTAL_LEVEL_COL
+from utils.profiling import span
+
+
+def save_csv(pivot, file_path, config):
+    """Write one record per pivot row, with its full labels and its subtotal level (empty for data rows)."""
+    if not len(pivot):
+        logging.warning("No data to write to the CSV file.")
+        return
+
+    try:
+        with span("csv_write", rows_in=len(pivot)), open(file_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(pivot.header + [SUBTOTAL_LEVEL_COL])
+            writer.writerows(zip(*pivot.record_columns(), pivot.levels))
+        logging.info("CSV generation completed successfully.")
+    except Exception as e:
+        logging.error(f"Error building CSV: {e}")
@@ -0,0 +1,82 @@
+import logging
+import os
+from html import escape
+from utils.profiling import span
+
+PAGE_START = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+table {{ border-collapse: collapse; font-family: Helvetica, Arial, sans-serif; font-size: 10pt; }}
+th, td {{ border: 1px solid #000; padding: 4px 8px; vertical-align: middle; }}
+{rules}
+</style>
+</head>
+<body>
+<table>
+"""
+PAGE_END = "</tbody>\n</table>\n</body>\n</html>\n"
+
+
+def css_rules(config):
+    """Translate the colour and alignment config into CSS, with one class per subtotal level."""
+    colors = config['colors']
+    rules = [f"th {{ text-align: {config['alignment']['header'].lower()}; font-weight: bold; }}",
+             f"td {{ text-align: {config['alignment']['global'].lower()}; }}",
+             f"td.number {{ text-align: {config['alignment']['content']['numbers'].lower()}; }}"]
+    selectors = {'header': "th", 'default': "td", 'grand_total': "tr.grand-total td"}
+    for key, value in colors.items():
+        selector = selectors.get(key, f"tr.{key.replace('_', '-')} td")
+        rules.append(f"{selector} {{ background: #{value['background']}; color: #{value['text']}; }}")
+    # Cells left of a subtotal's label keep the plain colours, as in the Excel output.
+    default = colors.get('default', {'background': "FFFFFF", 'text': "000000"})
+    rules.append(f"table tr td.plain {{ background: #{default['background']}; color: #{default['text']}; }}")
+    return "\n".join(rules)
+
+
+def row_class(level):
+    if level == 0:
+        return ' class="grand-total"'
+    return f' class="subtotal-{level}"' if level else ""
+
+
+def save_html(pivot, file_path, config):
+    """Write a self-contained HTML page, with merged label cells as row spans and a CSS class per row level."""
+    if not len(pivot):
+        logging.warning("No data to write to the HTML file.")
+        return
+
+    rowspans = {(first, col): last - first + 1 for col, first, last in pivot.merge_runs.tolist()}
+    covered = {(row, col) for col, first, last in pivot.merge_runs.tolist() for row in range(first + 1, last + 1)}
+    numeric = [column_type == "number" for column_type in pivot.column_types]
+
+    def cell(row_idx, col, value, level):
+        classes = []
+        if numeric[col] and value != "":
+            classes.append("number")
+        if level and col < level - 1:
+            classes.append("plain")
+        attributes = f' class="{" ".join(classes)}"' if classes else ""
+        if (row_idx, col) in rowspans:
+            attributes += f' rowspan="{rowspans[row_idx, col]}"'
+        return f"<td{attributes}>{escape(str(value))}</td>"
+
+    def row_html(row_idx, row, level):
+        cells = "".join(cell(row_idx, col, value, level) for col, value in enumerate(row)
+                        if (row_idx, col) not in covered)
+        return f"<tr{row_class(level)}>{cells}</tr>\n"
+
+    try:
+        with span("html_write", rows_in=len(pivot)), open(file_path, "w", encoding="utf-8") as file:
+            title = escape(os.path.splitext(os.path.basename(file_path))[0])
+            file.write(PAGE_START.format(title=title, rules=css_rules(config)))
+            file.write("<thead><tr>" + "".join(f"<th>{escape(str(name))}</th>" for name in pivot.header)
+                       + "</tr></thead>\n<tbody>\n")
+            file.writelines(row_html(row_idx, row, level)
+                            for row_idx, (row, level) in enumerate(zip(pivot.rows, pivot.levels)))
+            file.write(PAGE_END)
+        logging.info("HTML generation completed successfully.")
+    except Exception as e:
+        logging.error(f"Error building HTML: {e}")
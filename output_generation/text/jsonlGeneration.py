@@ -0,0 +1,45 @@
+import json
+import logging
+from data_processing.tableDataProcessing import SUBTOTAL_LEVEL_COL
+from utils.profiling import span
+
+CHUNK_ROWS = 10_000
+
+
+def encode_column(values, prefix, encode, cache):
+    """Encode one column as `"key": value` fragments; each distinct label is encoded once.
+
+    Only strings are cached, since numbers such as 1 and 1.0 compare equal but encode differently.
+    """
+    fragments = []
+    for value in values:
+        if value.__class__ is str:
+            fragment = cache.get(value)
+            if fragment is None:
+                fragment = cache[value] = prefix + encode(value)
+        else:
+            fragment = prefix + encode(value)
+        fragments.append(fragment)
+    return fragments
+
+
+def save_jsonl(pivot, file_path, config):
+    """Write one JSON object per pivot row, keyed by column, with its subtotal level (null for data rows)."""
+    if not len(pivot):
+        logging.warning("No data to write to the JSON Lines file.")
+        return
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    keys = pivot.header + [SUBTOTAL_LEVEL_COL]
+    prefixes = ["{" + encode(keys[0]) + ": "] + [", " + encode(key) + ": " for key in keys[1:]]
+    columns = pivot.record_columns() + [pivot.levels]
+    caches = [{} for _ in keys]
+    try:
+        with span("jsonl_write", rows_in=len(pivot)), open(file_path, "w", encoding="utf-8") as file:
+            for start in range(0, len(pivot), CHUNK_ROWS):
+                fragments = [encode_column(column[start:start + CHUNK_ROWS], prefix, encode, cache)
+                             for column, prefix, cache in zip(columns, prefixes, caches)]
+                file.writelines("".join(parts) + "}\n" for parts in zip(*fragments))
+        logging.info("JSON Lines generation completed successfully.")
+    except Exception as e:
+        logging.error(f"Error building JSON Lines: {e}")
@@ -0,0 +1,277 @@
+"""Local report server: keeps parsed datasets in memory and renders reports on demand.
+
+Start it from the repository root, with the same PYTHONPATH as main.py, on a TCP port or a Unix socket:
+
+    python main.py serve --port 8765
+    python main.py serve --socket /tmp/pivot.sock
+
+A report is requested by posting the `data` section of a config, or a whole config, as JSON; the file is
+streamed back in the response body. Styles default to those of the server's --config-file.
+
+    curl -s -X POST 'http://127.0.0.1:8765/report?format=excel' -d @report.json -o report.xlsx
+    curl -s --unix-socket /tmp/pivot.sock 'http://localhost/report?format=csv' -d @report.json -o report.csv
+    curl -s http://127.0.0.1:8765/health
+
+Pivots are computed one at a time on a single thread, which owns the dataset cache; output files are rendered
+on a pool of worker processes. At most `workers + queue_size` reports are accepted at once; further requests
+are answered with 503 and a Retry-After header until a slot frees up.
+"""
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+from data_processing.data_processing_controller import load_final_data
+from data_processing.dataset_cache import DEFAULT_MAX_MB, DatasetCache
+from data_processing.rendered_pivot import pivot_columns, render_pivot
+from output_generation.outputFormats import OUTPUT_FORMATS, get_renderer, output_extension, selected_formats
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 8
+MAX_BODY_BYTES = 1024 * 1024
+READ_TIMEOUT_SECONDS = 30
+STREAM_CHUNK_BYTES = 256 * 1024
+RETRY_AFTER_SECONDS = 1
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "html": "text/html; charset=utf-8",
+}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def import_renderers() -> None:
+    """Import every renderer once when a worker process starts, instead of on its first report."""
+    for file_type in OUTPUT_FORMATS:
+        get_renderer(file_type)
+
+
+async def read_request(reader: asyncio.StreamReader):
+    request_line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+    parts = request_line.split(" ")
+    if len(parts) != 3:
+        raise HttpError(400, "Malformed request line.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    return parts[0], parts[1], body
+
+
+def response_head(status: int, headers: Dict) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in {**headers, "Connection": "close"}.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: Dict, headers: Optional[Dict] = None):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(response_head(status, {"Content-Type": "application/json", "Content-Length": len(body),
+                                        **(headers or {})}))
+    writer.write(body)
+    await writer.drain()
+
+
+async def send_error(writer: asyncio.StreamWriter, status: int, message: str, headers: Optional[Dict] = None):
+    # The client may already be gone, or the response half sent; there is nothing more to tell it then.
+    try:
+        await send_json(writer, status, {"error": message}, headers)
+    except ConnectionError:
+        pass
+
+
+async def send_file(writer: asyncio.StreamWriter, file_path: str, content_type: str) -> None:
+    """Stream a file to the client in chunks, waiting for the socket to drain so memory stays flat."""
+    writer.write(response_head(200, {
+        "Content-Type": content_type,
+        "Content-Length": os.path.getsize(file_path),
+        "Content-Disposition": f'attachment; filename="{os.path.basename(file_path)}"',
+    }))
+    with open(file_path, "rb") as file:
+        while chunk := file.read(STREAM_CHUNK_BYTES):
+            writer.write(chunk)
+            await writer.drain()
+
+
+def report_config(body: bytes, default_styles: Dict) -> Dict:
+    try:
+        config = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise HttpError(400, f"The request body is not valid JSON: {e}")
+    if not isinstance(config, dict):
+        raise HttpError(400, "The request body must be a JSON object.")
+    if "data" not in config:
+        config = {"data": config}
+    for section in ("data", "output", "styles", "cache"):
+        if section in config and not isinstance(config[section], dict):
+            raise HttpError(400, f"The '{section}' section of the report config must be a JSON object.")
+    # Clients may switch the result cache on, but the cache and incremental state directories stay the server's.
+    config["cache"] = {"enabled": bool(config.get("cache", {}).get("enabled", False))}
+    config["data"].pop("incremental_state_dir", None)
+    config.setdefault("styles", default_styles)
+    return config
+
+
+class PivotServer:
+    def __init__(self, default_styles: Dict, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 cache_mb: float = DEFAULT_MAX_MB, use_cache: bool = True):
+        self.default_styles = default_styles
+        self.use_cache = use_cache
+        self.max_pending = workers + queue_size
+        self.pending = 0
+        self.served = 0
+        self.datasets = DatasetCache(cache_mb)
+        # One thread owns the pandas work and the dataset cache; renders run in processes, in parallel.
+        self.pivot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pivot")
+        self.render_executor = ProcessPoolExecutor(max_workers=workers, initializer=import_renderers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def close(self) -> None:
+        self.pivot_executor.shutdown(cancel_futures=True)
+        self.render_executor.shutdown(cancel_futures=True)
+
+    def build_pivot(self, config: Dict):
+        final_data = load_final_data(config, self.use_cache, self.datasets)
+        if final_data is None:
+            return None
+        data_config = config["data"]
+        return render_pivot(final_data, pivot_columns(data_config["group_cols"], data_config["agg_col"]))
+
+    async def render_report(self, config: Dict, file_type: str, output_dir: str) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            pivot = await loop.run_in_executor(self.pivot_executor, self.build_pivot, config)
+        except (FileNotFoundError, KeyError, ValueError) as e:
+            raise HttpError(400, f"Cannot build the report: {e}")
+        if pivot is None or not len(pivot):
+            raise HttpError(422, "No data matched the report.")
+        # The name only labels the download; keep it from pointing outside the temporary directory.
+        report_name = os.path.basename(str(config.get("output", {}).get("name", ""))) or "PivotTable"
+        file_path = os.path.join(output_dir, f"{report_name}.{output_extension(file_type)}")
+        await loop.run_in_executor(self.render_executor, get_renderer(file_type), pivot, file_path,
+                                   config["styles"])
+        # Renderers log their own errors rather than raising them.
+        if not os.path.isfile(file_path):
+            raise HttpError(500, f"Rendering the {file_type} file failed; see the server log.")
+        return file_path
+
+    async def report(self, writer: asyncio.StreamWriter, query: Dict, body: bytes) -> None:
+        config = report_config(body, self.default_styles)
+        try:
+            file_type = selected_formats(config, query.get("format", [])[:1])[0]
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "Too many reports in progress; retry shortly.",
+                            {"Retry-After": RETRY_AFTER_SECONDS})
+        self.pending += 1
+        try:
+            with tempfile.TemporaryDirectory(prefix="pivot_report_") as output_dir:
+                file_path = await self.render_report(config, file_type, output_dir)
+                await send_file(writer, file_path, CONTENT_TYPES.get(file_type, "application/octet-stream"))
+                self.served += 1
+        finally:
+            self.pending -= 1
+
+    def health(self) -> Dict:
+        return {"pending": self.pending, "max_pending": self.max_pending, "served": self.served,
+                "datasets": self.datasets.stats()}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        start = time.perf_counter()
+        method = target = "-"
+        status = 200
+        try:
+            try:
+                method, target, body = await asyncio.wait_for(read_request(reader), READ_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise HttpError(408, "Timed out reading the request.")
+            except asyncio.IncompleteReadError:
+                raise HttpError(400, "The request body is shorter than its Content-Length.")
+            url = urlsplit(target)
+            if url.path == "/health":
+                await send_json(writer, 200, self.health())
+            elif url.path == "/report":
+                if method != "POST":
+                    raise HttpError(405, "Post a report config to /report.", {"Allow": "POST"})
+                await self.report(writer, parse_qs(url.query), body)
+            else:
+                raise HttpError(404, f"No such endpoint: {url.path}")
+        except HttpError as e:
+            status = e.status
+            await send_error(writer, e.status, str(e), e.headers)
+        except ConnectionError:
+            status = 499
+        except Exception as e:
+            status = 500
+            logger.exception(f"Error serving {method} {target}")
+            await send_error(writer, 500, str(e))
+        finally:
+            logger.info(f"{method} {target} -> {status} in {time.perf_counter() - start:.3f}s")
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def run_server(server: PivotServer, host: str, port: int, socket_path: Optional[str]) -> None:
+    if socket_path:
+        listener = await asyncio.start_unix_server(server.handle, path=socket_path)
+        logger.info(f"Serving reports on {socket_path}.")
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        logger.info(f"Serving reports on http://{host}:{port}.")
+    # Stop on SIGTERM as on Ctrl-C, so the socket file is removed and the worker processes are shut down.
+    stopped = asyncio.Event()
+    with contextlib.suppress(NotImplementedError):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    async with listener:
+        await stopped.wait()
+    logger.info("Server stopped.")
+
+
+def serve(default_styles: Dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None,
+          workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE, cache_mb: float = DEFAULT_MAX_MB,
+          use_cache: bool = True) -> None:
+    server = PivotServer(default_styles, workers, queue_size, cache_mb, use_cache)
+    try:
+        asyncio.run(run_server(server, host, port, socket_path))
+    except KeyboardInterrupt:
+        logger.info("Server stopped.")
+    finally:
+        server.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
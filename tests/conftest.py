@@ -0,0 +1,10 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules import their siblings by bare name, as main.py runs them with these directories on PYTHONPATH.
+for path in ["", "data_processing", "output_generation/excel", "output_generation/pdf"]:
+    directory = os.path.join(REPO_ROOT, path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
@@ -0,0 +1,87 @@
+"""Every aggregation backend against the pandas reference backend, on the same input files and configs."""
+import numpy as np
+import pandas as pd
+import pytest
+from aggregation_backends import BACKEND_MODULES, build_backend_final_data, get_backend
+from data_processing_controller import build_final_data
+
+BACKEND_STEPS = ["AGGREGATIONS", "TYPE_INFERENCE_ERRORS", "session", "load", "filter_rows", "group", "sort",
+                 "collect", "rollup", "to_pandas"]
+
+CONFIGS = {
+    "count": {"agg_func": "count", "agg_col": "Count", "filters": {"result": "failed"}},
+    "sum": {"agg_func": "sum", "agg_col": "duration", "filters": {"duration": {"between": [1, 80]}}},
+    "mean": {"agg_func": "mean", "agg_col": "score", "filters": {"result": {"ne": "passed"}}},
+    "min": {"agg_func": "min", "agg_col": "duration", "filters": {"feature": ["cart", "pay"]}},
+    "max": {"agg_func": "max", "agg_col": "score", "filters": {"comment": {"is_null": False}}},
+    "nunique": {"agg_func": "nunique", "agg_col": "duration", "filters": {}},
+    # Patterns both regex engines read like Python's re module.
+    "regex": {"agg_func": "count", "agg_col": "Count", "filters": {"comment": {"regex": "^fl|issue$"}}},
+    "top_n": {"agg_func": "sum", "agg_col": "duration", "filters": {}, "top_n": 2},
+}
+
+
+@pytest.fixture(scope="module")
+def input_files(tmp_path_factory):
+    rng = np.random.default_rng(11)
+    rows = 3_000
+    data = pd.DataFrame({
+        "feature": rng.choice(["cart", "pay", "search", "login"], rows),
+        "errorType": rng.choice(["Assert", "Timeout", "Crash", None], rows, p=[0.4, 0.3, 0.25, 0.05]),
+        "comment": rng.choice(["bug", "flaky", "env", "data issue", None], rows),
+        "result": rng.choice(["failed", "passed", None], rows, p=[0.6, 0.35, 0.05]),
+        "duration": rng.integers(0, 100, rows),
+        "score": rng.normal(50, 10, rows).round(3),
+    })
+    directory = tmp_path_factory.mktemp("backends")
+    files = {"csv": str(directory / "data.csv"), "parquet": str(directory / "data.parquet")}
+    data.to_csv(files["csv"], index=False)
+    data.to_parquet(files["parquet"], index=False)
+    return files
+
+
+def data_config(name, file_path, backend):
+    return dict(CONFIGS[name], csv_file_path=file_path, backend=backend, group_cols=["feature", "errorType", "comment"],
+                subtotal_col=["feature", "errorType"])
+
+
+@pytest.mark.parametrize("backend", list(BACKEND_MODULES))
+def test_backend_exposes_every_step(backend):
+    module = get_backend(backend)
+    assert [step for step in BACKEND_STEPS if not hasattr(module, step)] == []
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+@pytest.mark.parametrize("name", list(CONFIGS))
+def test_pandas_backend_matches_default_path(input_files, file_format, name):
+    config = data_config(name, input_files[file_format], "pandas")
+    pd.testing.assert_frame_equal(build_backend_final_data(config["csv_file_path"], config),
+                                  build_final_data(config["csv_file_path"], config), check_dtype=False)
+
+
+@pytest.mark.parametrize("backend", [name for name in BACKEND_MODULES if name != "pandas"])
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+@pytest.mark.parametrize("name", list(CONFIGS))
+def test_backend_matches_pandas_backend(input_files, backend, file_format, name):
+    pytest.importorskip(backend)
+    config = data_config(name, input_files[file_format], backend)
+    reference = build_backend_final_data(config["csv_file_path"], dict(config, backend="pandas"))
+    pd.testing.assert_frame_equal(build_backend_final_data(config["csv_file_path"], config), reference,
+                                  check_dtype=False)
+
+
+def test_duckdb_runs_every_step_on_the_configured_connection(input_files, monkeypatch):
+    duckdb = pytest.importorskip("duckdb")
+
+    def default_connection(*args, **kwargs):
+        raise AssertionError("query ran on the default connection")
+
+    monkeypatch.setattr(duckdb, "from_arrow", default_connection)
+    monkeypatch.setattr(duckdb, "sql", default_connection)
+    config = dict(data_config("sum", input_files["csv"], "duckdb"), backend_options={"threads": 1})
+    assert build_backend_final_data(config["csv_file_path"], config) is not None
+
+    with get_backend("duckdb").session({"threads": 1}) as connection:
+        assert connection.execute("SELECT current_setting('threads')").fetchone()[0] == 1
+    with pytest.raises(duckdb.ConnectionException):
+        connection.execute("SELECT 1")
@@ -0,0 +1,31 @@
+"""Frames shared between the reports of a batch, one per input file and input format."""
+import json
+import os
+import pandas as pd
+import pytest
+from batch_processing import load_shared_datasets, run_batch
+from conftest import REPO_ROOT
+
+
+@pytest.fixture
+def spec(tmp_path):
+    parquet_path = str(tmp_path / "data.parquet")
+    pd.DataFrame({"feature": ["cart", "pay", "cart"], "Count": [1, 2, 3]}).to_parquet(parquet_path, index=False)
+    with open(os.path.join(REPO_ROOT, "config", "config.json")) as file:
+        styles = json.load(file)["styles"]
+    return {"name": "parquet", "styles": styles, "output": {"formats": ["csv"]},
+            "data": {"csv_file_path": parquet_path, "filters": {}, "group_cols": ["feature"], "agg_func": "sum",
+                     "agg_col": "Count", "subtotal_col": []}}
+
+
+def test_reports_with_different_input_formats_do_not_share_a_frame(spec):
+    as_csv = dict(spec, name="as_csv", data=dict(spec["data"], input_format="csv"))
+    implicit = dict(spec, name="implicit")
+    datasets = load_shared_datasets([spec, as_csv, implicit], use_cache=False)
+    path = spec["data"]["csv_file_path"]
+    assert sorted(datasets) == [(path, "csv"), (path, "parquet")]
+    assert datasets[path, "parquet"]["Count"].sum() == 6
+
+    timings = run_batch([spec, as_csv, implicit], use_cache=False)
+    # Reading Parquet bytes as CSV must not quietly reuse the Parquet frame.
+    assert [timing["status"] for timing in timings] == ["ok", "no data", "ok"]
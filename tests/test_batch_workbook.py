@@ -0,0 +1,38 @@
+"""Batch reports written as the sheets of one workbook, one sheet per report with an Excel output."""
+import json
+import os
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from batch_processing import run_batch
+from conftest import REPO_ROOT
+
+
+@pytest.fixture
+def specs(tmp_path):
+    csv_path = str(tmp_path / "data.csv")
+    pd.DataFrame({"feature": ["cart", "pay", "cart", "search"], "result": ["failed"] * 4,
+                  "Count": [1, 2, 3, 4]}).to_csv(csv_path, index=False)
+    with open(os.path.join(REPO_ROOT, "config", "config.json")) as file:
+        styles = json.load(file)["styles"]
+    data = {"csv_file_path": csv_path, "filters": {"result": "failed"}, "group_cols": ["feature"],
+            "agg_func": "count", "agg_col": "Count", "subtotal_col": []}
+    return [{"name": "first", "styles": styles, "data": data, "output": {"formats": ["excel"]}},
+            {"name": "no_excel", "styles": styles, "data": data, "output": {"formats": ["csv"]}},
+            {"name": "broken", "styles": styles, "data": dict(data, group_cols=["missing"])},
+            {"name": "last", "styles": styles, "data": dict(data, filters={}), "output": {"formats": ["excel"]}}]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_sheets_follow_batch_order(tmp_path, specs, jobs):
+    workbook_path = str(tmp_path / "batch.xlsx")
+    timings = run_batch(specs, jobs=jobs, use_cache=False, workbook=workbook_path)
+
+    assert [timing["status"] for timing in timings] == ["ok", "ok", "failed", "ok"]
+    assert all("pivot_table" not in timing for timing in timings)
+    workbook = load_workbook(workbook_path)
+    assert workbook.sheetnames == ["first", "last"]
+    assert workbook["first"]["A1"].value == "feature"
+    # Only the report without an Excel output wrote a file of its own.
+    assert [name.split("_", 2)[-1] for name in sorted(os.listdir(tmp_path))
+            if name.endswith((".csv", ".xlsx")) and name[:1].isdigit()] == ["no_excel.csv"]
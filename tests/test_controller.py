@@ -0,0 +1,31 @@
+"""Config errors are logged by the single-report entry point instead of escaping as tracebacks."""
+import logging
+import pandas as pd
+import pytest
+from data_processing_controller import process_data_and_generate_files
+
+
+@pytest.fixture
+def config(tmp_path):
+    csv_path = str(tmp_path / "data.csv")
+    pd.DataFrame({"A": ["x", "y"], "B": [1, 2]}).to_csv(csv_path, index=False)
+    return {"styles": {}, "data": {"csv_file_path": csv_path, "filters": {}, "group_cols": ["A"],
+                                   "agg_func": "sum", "agg_col": "B", "subtotal_col": []}}
+
+
+def test_unknown_output_format_is_logged(config, caplog):
+    config["output"] = {"formats": ["docx"]}
+    with caplog.at_level(logging.ERROR):
+        process_data_and_generate_files(config)
+    assert "Unknown output formats ['docx']" in caplog.text
+
+
+def test_columnar_input_without_pyarrow_is_logged(config, caplog, monkeypatch):
+    import input_formats
+    parquet_path = config["data"]["csv_file_path"].replace(".csv", ".parquet")
+    pd.read_csv(config["data"]["csv_file_path"]).to_parquet(parquet_path)
+    config["data"]["csv_file_path"] = parquet_path
+    monkeypatch.setattr(input_formats, "pa", None)
+    with caplog.at_level(logging.ERROR):
+        process_data_and_generate_files(config, formats=["csv"])
+    assert "requires the optional pyarrow package" in caplog.text
@@ -0,0 +1,75 @@
+"""The dataset cache under concurrent readers: loads run outside its lock and each path is loaded once."""
+import threading
+import pandas as pd
+import pytest
+import dataset_cache
+from dataset_cache import DatasetCache
+
+DATA_CONFIG = {"filters": {}, "group_cols": ["A"], "agg_func": "sum", "agg_col": "B", "subtotal_col": []}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    file_path = str(tmp_path / "data.csv")
+    pd.DataFrame({"A": ["x", "y", "x"], "B": [1, 2, 3], "C": [4, 5, 6]}).to_csv(file_path, index=False)
+    return file_path
+
+
+@pytest.fixture
+def blocked_loads(monkeypatch):
+    """Hold every load_data call until `release` is set, counting the calls."""
+    state = {"calls": 0, "started": threading.Event(), "release": threading.Event()}
+    load_data = dataset_cache.load_data
+
+    def blocked_load_data(*args, **kwargs):
+        state["calls"] += 1
+        state["started"].set()
+        state["release"].wait(5)
+        return load_data(*args, **kwargs)
+
+    monkeypatch.setattr(dataset_cache, "load_data", blocked_load_data)
+    return state
+
+
+def run_in_thread(func, *args):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(func(*args)))
+    thread.start()
+    return thread, results
+
+
+def test_stats_do_not_wait_for_a_load(csv_path, blocked_loads):
+    cache = DatasetCache()
+    loader, _ = run_in_thread(cache.get, csv_path, DATA_CONFIG)
+    assert blocked_loads["started"].wait(5)
+
+    reader, stats = run_in_thread(cache.stats)
+    reader.join(1)
+    blocked_loads["release"].set()
+    loader.join(5)
+    assert not reader.is_alive()
+    assert stats == [{"files": 0, "mb": 0.0, "hits": 0, "misses": 0}]
+
+
+def test_concurrent_readers_of_one_path_share_a_load(csv_path, blocked_loads):
+    cache = DatasetCache()
+    first, first_result = run_in_thread(cache.get, csv_path, DATA_CONFIG)
+    assert blocked_loads["started"].wait(5)
+    second, second_result = run_in_thread(cache.get, csv_path, DATA_CONFIG)
+    blocked_loads["release"].set()
+    first.join(5)
+    second.join(5)
+
+    assert blocked_loads["calls"] == 1
+    assert first_result[0] is second_result[0]
+    assert {k: cache.stats()[k] for k in ("files", "hits", "misses")} == {"files": 1, "hits": 1, "misses": 1}
+
+
+def test_wider_request_extends_the_cached_frame(csv_path):
+    cache = DatasetCache()
+    cache.get(csv_path, DATA_CONFIG)
+    df = cache.get(csv_path, dict(DATA_CONFIG, filters={"C": 4}))
+    assert list(df.columns) == ["A", "B", "C"]
+    assert cache.get(csv_path, DATA_CONFIG) is df
+    assert cache.nbytes == int(df.memory_usage(deep=True).sum())
+    assert {k: cache.stats()[k] for k in ("files", "hits", "misses")} == {"files": 1, "hits": 1, "misses": 2}
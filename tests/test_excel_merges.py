@@ -0,0 +1,161 @@
+"""The level-based merge planner against the cell-by-cell scan it replaced, on representative pivots."""
+import bisect
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from openpyxl.cell.cell import MergedCell
+from dataProcessing import calculate_totals, preprocess_data
+from excelStyles import apply_merges, merge_empty_cells
+from rendered_pivot import pivot_columns, render_pivot
+
+
+def sample_data(rows=2_000, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "feature": rng.choice(["cart", "pay", "search", "login"], rows),
+        "errorType": rng.choice(["Assert", "Timeout", "Crash"], rows),
+        "comment": rng.choice(["bug", "flaky", "env", "net", "data issue"], rows),
+        "result": rng.choice(["failed", "passed"], rows),
+        "Count": rng.integers(1, 10, rows),
+    })
+
+
+def build_pivot(group_cols, subtotal_cols, rows=2_000):
+    grouped = preprocess_data(sample_data(rows), {"result": "failed"}, group_cols, "count", "Count")
+    return render_pivot(calculate_totals(grouped, subtotal_cols, "Count"), pivot_columns(group_cols, "Count"))
+
+
+# The original planner, which scanned the table cell by cell (worksheet coordinates: the header is row 1).
+
+def identify_subtotal_rows(df):
+    subtotal_rows, subtotal_levels = set(), {}
+    for col_idx, col in enumerate(df.columns[:-2], start=1):
+        blank_seen, level = False, 0
+        for row_idx, value in enumerate(df[col], start=2):
+            if pd.isna(value) or value == '':
+                blank_seen = True
+            elif blank_seen or "Grand Total" in str(value):
+                subtotal_rows.add(row_idx)
+                if col_idx == 1:
+                    subtotal_levels[row_idx] = level
+                blank_seen = False
+                level += 1
+    return subtotal_rows, subtotal_levels
+
+
+def merge_first_column(ranges, subtotal_rows, subtotal_levels):
+    row_idx_list = sorted(subtotal_rows)
+    start_row, prev_level = 3, -1
+    for row_idx in row_idx_list:
+        level = subtotal_levels.get(row_idx, -1)
+        if level > prev_level and row_idx > start_row:
+            add_range(ranges, start_row, 1, row_idx - 1)
+            start_row = row_idx + 1
+        prev_level = level
+    if start_row <= row_idx_list[-1]:
+        add_range(ranges, start_row, 1, row_idx_list[-1])
+
+
+def merge_remaining_columns(ranges, df, subtotal_rows, subtotal_levels):
+    for col_idx, col in enumerate(df.columns[:-2], start=1):
+        start_row = prev_subtotal_row = None
+        prev_subtotal_level = -1
+        data_row_found = False
+        for row_idx, value in enumerate(df[col], start=2):
+            if row_idx in subtotal_rows:
+                level = subtotal_levels.get(row_idx, -1)
+                if start_row is not None and row_idx - 1 != start_row and level > prev_subtotal_level:
+                    add_range(ranges, start_row, col_idx, row_idx - 1)
+                elif prev_subtotal_row is not None and level == prev_subtotal_level and not data_row_found:
+                    add_range(ranges, prev_subtotal_row + 1, col_idx, row_idx - 1)
+                start_row, prev_subtotal_row, prev_subtotal_level, data_row_found = None, row_idx, level, False
+            elif not pd.isna(value) and value != '':
+                if start_row is not None:
+                    add_range(ranges, start_row, col_idx, row_idx - 1)
+                start_row, data_row_found = None, True
+            elif start_row is None:
+                start_row = row_idx
+        if start_row is not None and start_row <= len(df):
+            add_range(ranges, start_row, col_idx, len(df) + 1)
+
+
+def add_range(ranges, start_row, col_idx, end_row):
+    if end_row > start_row:
+        ranges.append((start_row, col_idx, end_row))
+
+
+def drop_contained_ranges(ranges):
+    """Drop ranges inside an earlier range of the same column, as `worksheet.merge_cells` ended up doing."""
+    kept_by_column, kept = {}, []
+    for start_row, col_idx, end_row in ranges:
+        column = kept_by_column.setdefault(col_idx, [])
+        position = bisect.bisect_right(column, (start_row, float('inf')))
+        if position and column[position - 1][1] >= end_row:
+            continue
+        column.insert(position, (start_row, end_row))
+        kept.append((start_row, col_idx, end_row))
+    return kept
+
+
+def cell_by_cell_ranges(pivot):
+    df = pd.DataFrame(pivot.rows, columns=pivot.header)
+    ranges = []
+    subtotal_rows, subtotal_levels = identify_subtotal_rows(df)
+    merge_first_column(ranges, subtotal_rows, subtotal_levels)
+    merge_remaining_columns(ranges, df, subtotal_rows, subtotal_levels)
+    return drop_contained_ranges(ranges)
+
+
+def level_ranges(pivot):
+    return [(first + 2, col + 1, last + 2) for col, first, last in pivot.merge_runs.tolist()]
+
+
+# The two planners agree while at most one group column sits below the deepest subtotal level; below that,
+# the cell-by-cell scan mistook some data rows for subtotals.
+@pytest.mark.parametrize("group_cols, subtotal_cols", [
+    (["feature", "errorType", "comment"], ["feature", "errorType"]),
+    (["feature", "errorType"], ["feature"]),
+    (["feature", "errorType", "comment"], ["feature", "errorType", "comment"]),
+    (["errorType", "feature", "comment"], ["errorType", "feature"]),
+])
+@pytest.mark.parametrize("rows", [40, 2_000])
+def test_merge_runs_match_cell_by_cell_planner(group_cols, subtotal_cols, rows):
+    pivot = build_pivot(group_cols, subtotal_cols, rows)
+    assert sorted(level_ranges(pivot)) == sorted(cell_by_cell_ranges(pivot))
+
+
+def border_styles(cell):
+    border = cell.border
+    return border.left.style, border.right.style, border.top.style, border.bottom.style
+
+
+def test_apply_merges_matches_merge_cells():
+    """`apply_merges` relies on openpyxl internals; it must leave the sheet as `merge_cells` would."""
+    pivot = build_pivot(["feature", "errorType", "comment"], ["feature", "errorType"])
+    sheets = []
+    for bulk in (True, False):
+        worksheet = Workbook().active
+        worksheet.append(pivot.header)
+        for row in pivot.rows:
+            worksheet.append(row)
+        if bulk:
+            merge_empty_cells(worksheet, pivot)
+        else:
+            for start_row, col_idx, end_row in level_ranges(pivot):
+                worksheet.merge_cells(start_row=start_row, start_column=col_idx, end_row=end_row, end_column=col_idx)
+        sheets.append(worksheet)
+
+    bulk_sheet, reference = sheets
+    assert sorted(map(str, bulk_sheet.merged_cells.ranges)) == sorted(map(str, reference.merged_cells.ranges))
+    for bulk_row, reference_row in zip(bulk_sheet.iter_rows(), reference.iter_rows()):
+        for bulk_cell, reference_cell in zip(bulk_row, reference_row):
+            assert isinstance(bulk_cell, MergedCell) == isinstance(reference_cell, MergedCell)
+            assert bulk_cell.value == reference_cell.value
+            assert border_styles(bulk_cell) == border_styles(reference_cell)
+
+
+def test_apply_merges_without_ranges_leaves_sheet_unmerged():
+    worksheet = Workbook().active
+    apply_merges(worksheet, [])
+    assert not worksheet.merged_cells.ranges
@@ -0,0 +1,39 @@
+"""Input format detection, which falls back to CSV like the original `pd.read_csv` loader."""
+import pandas as pd
+import pytest
+from data_processing_controller import is_plain_csv_input, parse_workers
+from dataProcessing import load_data
+from file_formats import format_from_path
+
+
+@pytest.mark.parametrize("file_name, expected", [
+    ("data.csv", "csv"), ("data.CSV", "csv"), ("data.csv.gz", "csv"), ("data.txt", "csv"), ("data.tsv", "csv"),
+    ("data", "csv"), ("data.parquet", "parquet"), ("data.feather", "feather"), ("data.ipc", "arrow"),
+])
+def test_format_from_extension(file_name, expected):
+    assert format_from_path(file_name) == expected
+
+
+def test_explicit_format_overrides_extension():
+    assert format_from_path("data.txt", "parquet") == "parquet"
+
+
+def test_unknown_explicit_format_is_rejected():
+    with pytest.raises(ValueError, match="input_format"):
+        format_from_path("data.csv", "xls")
+
+
+@pytest.mark.parametrize("file_name", ["data.csv.gz", "data.txt"])
+def test_load_data_reads_other_csv_files(tmp_path, file_name):
+    frame = pd.DataFrame({"A": ["x", "y"], "B": [1, 2]})
+    file_path = str(tmp_path / file_name)
+    frame.to_csv(file_path, index=False)
+    pd.testing.assert_frame_equal(load_data(file_path), frame)
+
+
+def test_compressed_csv_is_not_split_by_offset(tmp_path):
+    file_path = str(tmp_path / "data.csv.gz")
+    pd.DataFrame({"A": ["x"], "B": [1]}).to_csv(file_path, index=False)
+    data_config = {"agg_func": "sum", "parallel_threshold_mb": 0, "parse_workers": 4}
+    assert not is_plain_csv_input(file_path, data_config)
+    assert parse_workers(file_path, data_config) == 1
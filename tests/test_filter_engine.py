@@ -0,0 +1,85 @@
+"""Filter operators against a per-value reference, on plain and category columns with missing values."""
+import math
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from filter_engine import SELECTIVITY_SAMPLE_ROWS, apply_compiled_filters, compile_filters, order_by_selectivity
+
+TEXT_VALUES = ["bug", "flaky", "env", "data issue", None]
+NUMBER_VALUES = [1, 2, 3, 5, 8, np.nan]
+
+TEXT_CASES = [("eq", "bug"), ("ne", "bug"), ("in", ["bug", "env"]), ("not_in", ["bug", "env"]), ("gt", "env"),
+              ("ge", "env"), ("lt", "env"), ("le", "env"), ("between", ["c", "f"]), ("regex", "^fl|issue$"),
+              ("is_null", True), ("is_null", False)]
+NUMBER_CASES = [("eq", 3), ("ne", 3), ("in", [1, 2]), ("not_in", [1, 2]), ("gt", 3), ("ge", 3), ("lt", 3),
+                ("le", 3), ("between", [2, 5]), ("regex", "^[12n]"), ("is_null", True), ("is_null", False)]
+
+
+def is_missing(x):
+    return x is None or (isinstance(x, float) and math.isnan(x))
+
+
+def reference(x, operator, value):
+    """What a filter keeps, value by value; a missing value only passes ne, not_in and is_null."""
+    if is_missing(x):
+        return operator in ("ne", "not_in") or (operator == "is_null" and value)
+    return {"eq": lambda: x == value, "ne": lambda: x != value, "in": lambda: x in value,
+            "not_in": lambda: x not in value, "gt": lambda: x > value, "ge": lambda: x >= value,
+            "lt": lambda: x < value, "le": lambda: x <= value, "between": lambda: value[0] <= x <= value[1],
+            "regex": lambda: re.search(value, str(x)) is not None, "is_null": lambda: not value}[operator]()
+
+
+def sample_frame(values, rows=60, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"col": [values[i] for i in rng.integers(0, len(values), rows)], "row": range(rows)})
+
+
+def check(df, operator, value):
+    expected = [row for x, row in zip(df["col"], df["row"]) if reference(x, operator, value)]
+    filtered = apply_compiled_filters(df, compile_filters({"col": {operator: value}}))
+    assert filtered["row"].tolist() == expected
+
+
+@pytest.mark.parametrize("as_category", [False, True])
+@pytest.mark.parametrize("operator, value", TEXT_CASES)
+def test_text_operators(operator, value, as_category):
+    df = sample_frame(TEXT_VALUES)
+    check(df.astype({"col": "category"}) if as_category else df.astype({"col": object}), operator, value)
+
+
+@pytest.mark.parametrize("as_category", [False, True])
+@pytest.mark.parametrize("operator, value", NUMBER_CASES)
+def test_number_operators(operator, value, as_category):
+    df = sample_frame(NUMBER_VALUES)
+    check(df.astype({"col": "category"}) if as_category else df, operator, value)
+
+
+def test_scalar_and_list_shorthands():
+    df = sample_frame(TEXT_VALUES)
+    assert compile_filters({"col": "bug"}) == [("col", "eq", "bug")]
+    assert compile_filters({"col": ["bug", "env"]}) == [("col", "in", ["bug", "env"])]
+    check(df, "eq", "bug")
+
+
+@pytest.mark.parametrize("filters", [{"col": {"like": "x"}}, {"col": {"in": "bug"}}, {"col": {"between": [1]}},
+                                     {"col": {"regex": "("}}])
+def test_invalid_filters_are_rejected(filters):
+    with pytest.raises(ValueError):
+        compile_filters(filters)
+
+
+def test_selectivity_order_does_not_change_the_rows():
+    rng = np.random.default_rng(9)
+    rows = SELECTIVITY_SAMPLE_ROWS * 5
+    df = pd.DataFrame({"feature": rng.choice(["cart", "pay", "search", None], rows),
+                       "result": rng.choice(["failed", "passed"], rows, p=[0.9, 0.1]),
+                       "duration": rng.integers(0, 100, rows)}).astype({"feature": "category"})
+    filters = {"result": {"ne": "passed"}, "feature": {"not_in": ["pay"]}, "duration": {"between": [10, 12]}}
+    predicates = compile_filters(filters)
+    # The rarest predicate is evaluated first, so the order really changes.
+    assert order_by_selectivity(df, predicates) != predicates
+    assert order_by_selectivity(df, predicates)[0][0] == "duration"
+
+    mask = ((df["result"] != "passed") & ~df["feature"].isin(["pay"]) & df["duration"].between(10, 12)).to_numpy()
+    pd.testing.assert_frame_equal(apply_compiled_filters(df, predicates), df[mask])
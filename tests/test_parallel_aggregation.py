@@ -0,0 +1,47 @@
+"""Byte-range aggregation, which only merges partial aggregates that combine exactly."""
+import os
+import pandas as pd
+import pytest
+from dataProcessing import preprocess_data
+from parallel_aggregation import aggregate_range
+from streaming_aggregation import finalize_partial
+
+FILTERS = {"result": "failed"}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rows = 200
+    frame = pd.DataFrame({"feature": [f"f{i % 7}" for i in range(rows)],
+                          "result": ["failed" if i % 3 else "passed" for i in range(rows)],
+                          "duration": range(rows),
+                          # Integer in the first chunks, float in the last one.
+                          "score": [i if i < 150 else i + 0.1 for i in range(rows)]})
+    file_path = str(tmp_path / "data.csv")
+    frame.to_csv(file_path, index=False)
+    return file_path
+
+
+def aggregate(csv_path, agg_func, agg_col, exact):
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    with open(csv_path, "rb") as file:
+        start = len(file.readline())
+    return aggregate_range(csv_path, start, os.path.getsize(csv_path), columns, FILTERS, ["feature"],
+                           agg_func, agg_col, exact, 50, None, None)
+
+
+@pytest.mark.parametrize("agg_func, agg_col", [("count", "Count"), ("sum", "duration"), ("mean", "duration"),
+                                               ("min", "score"), ("max", "score")])
+def test_exact_merges_return_partials(csv_path, agg_func, agg_col):
+    result = aggregate(csv_path, agg_func, agg_col, exact=True)
+    assert not result["inexact"] and result["rows"] == 200
+    expected = preprocess_data(pd.read_csv(csv_path), FILTERS, ["feature"], agg_func, agg_col)
+    pd.testing.assert_frame_equal(finalize_partial(result["partial"], agg_func, agg_col), expected,
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize("agg_func", ["sum", "mean"])
+def test_float_sums_are_left_to_one_process(csv_path, agg_func):
+    result = aggregate(csv_path, agg_func, "score", exact=True)
+    assert result["inexact"]
+    assert not aggregate(csv_path, agg_func, "score", exact=False)["inexact"]
@@ -0,0 +1,31 @@
+"""Report configs posted to the server, which reject malformed sections and keep server paths out of reach."""
+import json
+import pytest
+from server.pivot_server import HttpError, report_config
+
+STYLES = {"colors": {}}
+
+
+def posted(config):
+    return report_config(json.dumps(config).encode(), STYLES)
+
+
+@pytest.mark.parametrize("config", [{"data": [1]}, {"data": {}, "output": "pdf"}, {"data": {}, "output": None},
+                                    {"data": {}, "styles": []}, {"data": {}, "cache": True}, [], "report"])
+def test_malformed_sections_are_bad_requests(config):
+    with pytest.raises(HttpError) as error:
+        posted(config)
+    assert error.value.status == 400
+
+
+def test_cache_keeps_only_enabled():
+    config = posted({"data": {"csv_file_path": "a.csv"},
+                     "cache": {"enabled": True, "directory": "/tmp/elsewhere", "max_size_mb": 1e9}})
+    assert config["cache"] == {"enabled": True}
+    assert posted({"data": {}})["cache"] == {"enabled": False}
+
+
+def test_incremental_state_dir_is_dropped():
+    config = posted({"csv_file_path": "a.csv", "incremental": True, "incremental_state_dir": "/tmp/elsewhere"})
+    assert config["data"] == {"csv_file_path": "a.csv", "incremental": True}
+    assert config["styles"] == STYLES
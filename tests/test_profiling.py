@@ -0,0 +1,25 @@
+"""Profiling spans and the tracemalloc session they share with the rest of the process."""
+import tracemalloc
+from utils.profiling import disable_profiling, enable_profiling, span
+
+
+def test_tracing_started_elsewhere_keeps_running():
+    tracemalloc.start()
+    try:
+        enable_profiling()
+        with span("stage", rows_in=3) as stage:
+            stage.rows_out = 2
+        records = disable_profiling()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert [(r["name"], r["rows_in"], r["rows_out"]) for r in records] == [("stage", 3, 2)]
+    assert records[0]["peak_mb"] >= 0
+
+
+def test_tracing_started_by_profiling_is_stopped():
+    assert not tracemalloc.is_tracing()
+    enable_profiling()
+    assert tracemalloc.is_tracing()
+    disable_profiling()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,109 @@
+"""Limiting a pivot to the top N groups of each parent, with the rest folded into an Other group."""
+import numpy as np
+import pandas as pd
+import pytest
+from dataProcessing import OTHER_LABEL, SUBTOTAL_LEVEL_COL, calculate_totals, limit_groups, preprocess_data
+
+GROUP_COLS = ["feature", "errorType", "comment"]
+
+
+def grouped_sample(rows=3_000, seed=5, features=("cart", "pay", "search", "login", "admin", "feed")):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({"feature": rng.choice(list(features), rows),
+                         "errorType": rng.choice(["Assert", "Timeout", "Crash", "Leak"], rows),
+                         "comment": rng.choice(["bug", "flaky", "env", "net", "data issue"], rows),
+                         "Count": rng.integers(1, 10, rows)})
+    return preprocess_data(data, {}, GROUP_COLS, "sum", "Count")
+
+
+def data_rows(final_data):
+    return final_data[final_data[SUBTOTAL_LEVEL_COL].isna()]
+
+
+def subtotal_rows(final_data, level):
+    return final_data[final_data[SUBTOTAL_LEVEL_COL] == level]
+
+
+@pytest.mark.parametrize("subtotal_cols", [["feature"], ["feature", "errorType"]])
+@pytest.mark.parametrize("top_n", [1, 2, 3])
+def test_totals_survive_folding(subtotal_cols, top_n):
+    grouped = grouped_sample()
+    full = calculate_totals(grouped, subtotal_cols, "Count")
+    limited = calculate_totals(grouped, subtotal_cols, "Count", top_n=top_n)
+
+    assert subtotal_rows(limited, 0)["Count"].tolist() == subtotal_rows(full, 0)["Count"].tolist()
+    assert data_rows(limited)["Count"].sum() == data_rows(full)["Count"].sum()
+    # Kept top-level groups keep their subtotal; the Other subtotal holds the rest.
+    full_first = subtotal_rows(full, 1).set_index("feature")["Count"]
+    limited_first = subtotal_rows(limited, 1).set_index("feature")["Count"]
+    kept = limited_first.drop(OTHER_LABEL)
+    assert kept.to_dict() == full_first[kept.index].to_dict()
+    assert limited_first[OTHER_LABEL] == full_first.drop(kept.index).sum()
+    # Every subtotal still sums the data rows below it.
+    for level, _ in enumerate(subtotal_cols, start=1):
+        keys = subtotal_cols[:level]
+        expected = data_rows(limited).groupby(keys)["Count"].sum()
+        assert subtotal_rows(limited, level).set_index(keys)["Count"].sort_index().equals(expected.sort_index())
+
+
+@pytest.mark.parametrize("top_n", [1, 2, 3])
+def test_at_most_n_plus_one_children_per_parent(top_n):
+    subtotal_cols = ["feature", "errorType"]
+    limited = data_rows(calculate_totals(grouped_sample(), subtotal_cols, "Count", top_n=top_n))
+    assert limited["feature"].nunique() <= top_n + 1
+    assert limited.groupby("feature")["errorType"].nunique().max() <= top_n + 1
+    assert limited.groupby(subtotal_cols).size().max() <= top_n + 1
+    # One Other row at most per parent and level.
+    assert not limited.duplicated(GROUP_COLS).any()
+
+
+def test_other_sorts_after_its_siblings():
+    subtotal_cols = ["feature", "errorType"]
+    limited = calculate_totals(grouped_sample(), subtotal_cols, "Count", top_n=2)
+    body = limited[limited[SUBTOTAL_LEVEL_COL] != 0].reset_index(drop=True)
+    for level, col in enumerate(GROUP_COLS, start=1):
+        rows = body if level > len(subtotal_cols) else subtotal_rows(body, level)
+        parents = GROUP_COLS[:level - 1]
+        for _, siblings in (rows.groupby(parents, sort=False) if parents else [(None, rows)]):
+            labels = siblings[col].tolist()
+            if OTHER_LABEL in labels:
+                assert labels.index(OTHER_LABEL) == len(labels) - 1
+    assert limited[SUBTOTAL_LEVEL_COL].iloc[-1] == 0
+
+
+def test_existing_other_group_absorbs_the_folded_groups():
+    grouped = grouped_sample(features=("cart", "pay", OTHER_LABEL, "login", "admin"))
+    totals = grouped.groupby("feature")["Count"].sum().sort_values(ascending=False, kind="stable")
+    limited = calculate_totals(grouped, ["feature"], "Count", top_n=2)
+
+    expected = {feature: totals[feature] for feature in totals.index[:2] if feature != OTHER_LABEL}
+    expected[OTHER_LABEL] = totals.sum() - sum(expected.values())
+    assert subtotal_rows(limited, 1).set_index("feature")["Count"].to_dict() == expected
+    assert subtotal_rows(limited, 1)["feature"].tolist()[-1] == OTHER_LABEL
+
+
+def test_largest_group_named_other_still_sorts_last():
+    grouped = pd.DataFrame({"feature": [OTHER_LABEL, "a", "b", "c"], "comment": ["x"] * 4, "Count": [10, 5, 3, 1]})
+    limited = calculate_totals(grouped, ["feature"], "Count", top_n=2)
+    assert subtotal_rows(limited, 1)[["feature", "Count"]].values.tolist() == [["a", 5], [OTHER_LABEL, 14]]
+
+
+def test_ties_keep_the_first_groups():
+    grouped = pd.DataFrame({"feature": ["a", "b", "c", "d"], "Count": [5, 3, 3, 3]})
+    limited = limit_groups(grouped, [], "Count", 2)
+    assert limited.set_index("feature")["Count"].to_dict() == {"a": 5, "b": 3, OTHER_LABEL: 6}
+
+
+def test_category_columns_fold_like_text_columns():
+    subtotal_cols = ["feature", "errorType"]
+    grouped = grouped_sample()
+    categorical = grouped.astype({col: "category" for col in GROUP_COLS})
+    expected = limit_groups(grouped, subtotal_cols, "Count", 2)
+    limited = limit_groups(categorical, subtotal_cols, "Count", 2)
+    pd.testing.assert_frame_equal(limited.astype({col: "str" for col in GROUP_COLS}), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("top_n", [0, -1, 1.5, True, "3"])
+def test_top_n_must_be_a_positive_integer(top_n):
+    with pytest.raises(ValueError, match="top_n"):
+        limit_groups(grouped_sample(), ["feature"], "Count", top_n)
@@ -0,0 +1,152 @@
+"""Per-stage profiling spans for the report pipeline.
+
+Pipeline stages are wrapped in `with span("stage", rows_in=...) as s:` blocks and may set `s.rows_out`.
+While profiling is disabled (the default) `span` returns a shared do-nothing object, so the hooks cost one
+function call per stage. Once `enable_profiling` is called every span records its wall time, CPU time, row
+counts and, when memory tracing is on, the tracemalloc peak reached inside it; outermost spans can also be
+dumped as cProfile files. Spans run in worker processes are not collected.
+"""
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+_state = None
+
+
+class NullSpan:
+    """Stands in for a span while profiling is disabled; assigning `rows_out` is harmless."""
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, name: str, rows_in: Optional[int]):
+        self.name, self.rows_in, self.rows_out = name, rows_in, None
+        self.parent, self.profiler, self.peak_seen = None, None, 0
+
+    def __enter__(self):
+        stack = _state["stack"]
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        if _state["trace_memory"]:
+            # reset_peak is global, so hand the peak reached so far over to the enclosing span first.
+            if self.parent is not None:
+                self.parent.peak_seen = max(self.parent.peak_seen, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        if _state["cprofile_dir"] and _state["profiler"] is None:
+            self.profiler = _state["profiler"] = cProfile.Profile()
+            self.profiler.enable()
+        self.start, self.cpu_start = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall, cpu = time.perf_counter() - self.start, time.process_time() - self.cpu_start
+        record = {"name": self.name, "depth": len(_state["stack"]) - 1,
+                  "start": self.start - _state["origin"], "wall_seconds": wall, "cpu_seconds": cpu,
+                  "rows_in": self.rows_in, "rows_out": self.rows_out, "failed": exc_type is not None}
+        if self.profiler is not None:
+            self.profiler.disable()
+            _state["profiler"] = None
+            _state["dumps"] += 1
+            record["cprofile"] = os.path.join(_state["cprofile_dir"], f"{_state['dumps']:03d}_{self.name}.prof")
+            self.profiler.dump_stats(record["cprofile"])
+        if _state["trace_memory"]:
+            peak = max(tracemalloc.get_traced_memory()[1], self.peak_seen)
+            record["peak_mb"] = (peak - self.memory_start) / MB
+            if self.parent is not None:
+                self.parent.peak_seen = max(self.parent.peak_seen, peak)
+        _state["records"].append(record)
+        _state["stack"].pop()
+        return False
+
+
+def span(name: str, rows_in: Optional[int] = None):
+    if _state is None:
+        return NULL_SPAN
+    return Span(name, rows_in)
+
+
+def profiling_enabled() -> bool:
+    return _state is not None
+
+
+def enable_profiling(trace_memory: bool = True, cprofile_dir: Optional[str] = None) -> None:
+    """Start recording spans; tracemalloc slows allocation-heavy stages, so it can be left off."""
+    global _state
+    if cprofile_dir:
+        os.makedirs(cprofile_dir, exist_ok=True)
+    # Tracing started by someone else is left running when profiling is disabled.
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _state = {"records": [], "stack": [], "origin": time.perf_counter(), "trace_memory": trace_memory,
+              "started_tracing": started_tracing, "cprofile_dir": cprofile_dir, "profiler": None, "dumps": 0}
+
+
+def disable_profiling() -> List[Dict]:
+    """Stop recording and return the span records in the order the spans finished."""
+    global _state
+    records, started_tracing = _state["records"], _state["started_tracing"]
+    _state = None
+    if started_tracing:
+        tracemalloc.stop()
+    return records
+
+
+def summarize(records: List[Dict]) -> List[Dict]:
+    """Merge the records of each stage, in the order the stages first started."""
+    stages = {}
+    for record in sorted(records, key=lambda r: r["start"]):
+        stage = stages.setdefault(record["name"], {"name": record["name"], "depth": record["depth"], "calls": 0,
+                                                   "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows_in": None,
+                                                   "rows_out": None, "peak_mb": None})
+        stage["calls"] += 1
+        stage["wall_seconds"] += record["wall_seconds"]
+        stage["cpu_seconds"] += record["cpu_seconds"]
+        for key in ("rows_in", "rows_out"):
+            if record[key] is not None:
+                stage[key] = (stage[key] or 0) + record[key]
+        if record.get("peak_mb") is not None:
+            stage["peak_mb"] = max(stage["peak_mb"] or 0.0, record["peak_mb"])
+    return list(stages.values())
+
+
+def format_cell(value, spec: str, width: int) -> str:
+    return (format(value, spec) if value is not None else "-").rjust(width)
+
+
+def log_profile_summary(records: List[Dict]) -> None:
+    logger.info(f"{'stage':<20} {'calls':>5} {'wall s':>9} {'cpu s':>9} {'rows in':>11} {'rows out':>11} "
+                f"{'peak MB':>9}")
+    for stage in summarize(records):
+        name = "  " * stage["depth"] + stage["name"]
+        logger.info(f"{name:<20} {stage['calls']:>5} {stage['wall_seconds']:>9.3f} {stage['cpu_seconds']:>9.3f} "
+                    f"{format_cell(stage['rows_in'], ',', 11)} {format_cell(stage['rows_out'], ',', 11)} "
+                    f"{format_cell(stage['peak_mb'], '.1f', 9)}")
+
+
+def write_trace(records: List[Dict], file_path: str) -> None:
+    """Write the spans in the Chrome trace event format, which chrome://tracing and Perfetto can open."""
+    events = [{"name": record["name"], "ph": "X", "pid": os.getpid(), "tid": 0,
+               "ts": record["start"] * 1e6, "dur": record["wall_seconds"] * 1e6,
+               "args": {key: value for key, value in record.items() if key not in ("name", "start", "wall_seconds")}}
+              for record in records]
+    with open(file_path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, indent=2)